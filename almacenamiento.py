@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capa de almacenamiento de la app de consumos.
+Hay dos backends con la misma interfaz y se elige con la variable de entorno
+RECEPCION_ALMACEN:
+
+  - csv (por defecto): pasajeros.csv + consumos_diarios.csv (libro_consumos).
+    Con RECEPCION_LOTE_MS y/o RECEPCION_LOTE_FILAS los consumos se escriben
+    por lotes (cada tantos milisegundos o filas) en lugar de uno por uno.
+  - sqlite: base recepcion.db en modo WAL, con índices por habitación y fecha,
+    apta para varios procesos escribiendo a la vez
+
+Para pasar los CSV existentes a SQLite (una sola vez, o para refrescar los
+pasajeros activos):
+
+    python almacenamiento.py importar [recepcion.db]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import libro_consumos
+import metricas
+import respaldos
+
+# Archivos de datos
+DB_PASAJEROS = 'pasajeros.csv'
+DB_SQLITE = 'recepcion.db'
+
+FORMATO_FECHA = libro_consumos.FORMATO_FECHA
+
+def _firma_archivo(ruta):
+    """Retorna (mtime, tamaño) del archivo, o None si no existe"""
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def fecha_orden(fecha):
+    """Convierte 'dd/mm/aaaa HH:MM' a 'aaaa-mm-dd HH:MM' (ordenable como texto)"""
+    try:
+        return datetime.strptime(str(fecha), FORMATO_FECHA).strftime('%Y-%m-%d %H:%M')
+    except ValueError:
+        return str(fecha)
+
+def leer_pasajeros_csv(ruta=DB_PASAJEROS):
+    """
+    Lee pasajeros.csv y retorna el diccionario habitación -> nombre.
+    Si hay varios pasajeros en la habitación, vale el primero (titular).
+    """
+    df_pasajeros = pd.read_csv(ruta, usecols=['Nro. habitación', 'Apellido y nombre'])
+    habitaciones = pd.to_numeric(df_pasajeros['Nro. habitación'], errors='coerce')
+
+    indice = {}
+    for habitacion, nombre in zip(habitaciones, df_pasajeros['Apellido y nombre']):
+        if pd.isna(habitacion):
+            continue
+        indice.setdefault(int(habitacion), nombre)
+    return indice
+
+class AlmacenCSV:
+    """Backend sobre pasajeros.csv y el libro de consumos en CSV"""
+
+    nombre = 'csv'
+
+    def __init__(self, ruta_pasajeros=DB_PASAJEROS):
+        self.ruta_pasajeros = ruta_pasajeros
+        # Índice en memoria {habitación: nombre}, compartido entre requests.
+        # Se reconstruye solo cuando pasajeros.csv cambia en disco (mtime/tamaño).
+        self._cache_pasajeros = {'firma': None, 'indice': {}}
+        self._lock_pasajeros = threading.Lock()
+
+    def _indice_pasajeros(self):
+        firma = _firma_archivo(self.ruta_pasajeros)
+        if firma == self._cache_pasajeros['firma']:
+            return self._cache_pasajeros['indice']
+
+        with self._lock_pasajeros:
+            # Otro request pudo haber recargado mientras esperábamos el lock
+            if firma != self._cache_pasajeros['firma']:
+                indice = leer_pasajeros_csv(self.ruta_pasajeros) if firma is not None else {}
+                self._cache_pasajeros['indice'] = indice
+                self._cache_pasajeros['firma'] = firma
+            return self._cache_pasajeros['indice']
+
+    def buscar_pasajero(self, habitacion):
+        """Nombre del pasajero de la habitación, o None si no está registrada"""
+        return self._indice_pasajeros().get(int(habitacion))
+
+    def buscar_pasajeros(self, habitaciones):
+        """{habitación: nombre} de las habitaciones registradas entre las pedidas"""
+        indice = self._indice_pasajeros()
+        return {habitacion: indice[habitacion] for habitacion in habitaciones if habitacion in indice}
+
+    def hay_consumos(self):
+        return libro_consumos.hay_consumos()
+
+    def registrar_consumo(self, registro):
+        return libro_consumos.registrar_consumo(registro)
+
+    def registrar_consumos(self, registros):
+        """Agrega varios consumos en una sola escritura; retorna sus ids"""
+        return libro_consumos.registrar_consumos(registros)
+
+    def listar_consumos(self):
+        return libro_consumos.leer_consumos()
+
+    def version(self):
+        """Versión de los consumos (cambia con cada alta, baja o reinicio)"""
+        return libro_consumos.version()
+
+    def pagina_consumos(self, filtros, desde, cantidad):
+        """(total, filas) del historial filtrado, solo con las filas de la página pedida"""
+        return libro_consumos.pagina_consumos(filtros, desde, cantidad)
+
+    def eliminar_consumo(self, id_consumo):
+        return libro_consumos.eliminar_consumo(id_consumo)
+
+    def tabla_totales(self, categorias):
+        return libro_consumos.tabla_totales(categorias)
+
+    def folio(self, habitacion):
+        """(consumos vigentes de la habitación, {categoria: total})"""
+        return libro_consumos.folio(habitacion)
+
+    def archivar_temporada(self, etiqueta='reinicio_temporada'):
+        """
+        Guarda los consumos vigentes en el almacén de respaldos y deja el libro
+        vacío. Retorna la entrada del respaldo (ver respaldos.respaldar).
+        """
+        return libro_consumos.archivar_temporada(etiqueta)
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS pasajeros (
+    habitacion INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    nro_doc TEXT,
+    fecha_ingreso TEXT,
+    fecha_egreso TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pasajeros_habitacion ON pasajeros (habitacion);
+
+CREATE TABLE IF NOT EXISTS consumos (
+    id TEXT PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    fecha_orden TEXT NOT NULL,
+    habitacion INTEGER NOT NULL,
+    pasajero TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    monto REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_consumos_habitacion ON consumos (habitacion);
+CREATE INDEX IF NOT EXISTS idx_consumos_fecha ON consumos (fecha_orden);
+
+-- Número de versión de los consumos, incrementado por triggers en cada cambio
+CREATE TABLE IF NOT EXISTS version_consumos (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    numero INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO version_consumos (id, numero) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS consumos_alta AFTER INSERT ON consumos
+BEGIN UPDATE version_consumos SET numero = numero + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS consumos_modificacion AFTER UPDATE ON consumos
+BEGIN UPDATE version_consumos SET numero = numero + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS consumos_baja AFTER DELETE ON consumos
+BEGIN UPDATE version_consumos SET numero = numero + 1 WHERE id = 1; END;
+"""
+
+class AlmacenSQLite:
+    """Backend SQLite (modo WAL) con una conexión por hilo"""
+
+    nombre = 'sqlite'
+
+    def __init__(self, ruta_db=DB_SQLITE):
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+
+    def conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=30)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.executescript(ESQUEMA_SQLITE)
+            self._local.conexion = conexion
+        return conexion
+
+    def buscar_pasajero(self, habitacion):
+        """Nombre del pasajero de la habitación, o None si no está registrada"""
+        fila = self.conexion().execute(
+            'SELECT nombre FROM pasajeros WHERE habitacion = ? ORDER BY rowid LIMIT 1',
+            (int(habitacion),)
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def buscar_pasajeros(self, habitaciones):
+        """{habitación: nombre} de las habitaciones registradas entre las pedidas, en una consulta"""
+        habitaciones = [int(habitacion) for habitacion in habitaciones]
+        if not habitaciones:
+            return {}
+        indice = {}
+        consulta = self.conexion().execute(
+            'SELECT habitacion, nombre FROM pasajeros WHERE habitacion IN '
+            '(SELECT value FROM json_each(?)) ORDER BY rowid',
+            (json.dumps(habitaciones),)
+        )
+        for habitacion, nombre in consulta:
+            indice.setdefault(habitacion, nombre)
+        return indice
+
+    def hay_consumos(self):
+        return self.conexion().execute('SELECT 1 FROM consumos LIMIT 1').fetchone() is not None
+
+    def registrar_consumo(self, registro):
+        id_consumo = registro.get('id') or libro_consumos.nuevo_id()
+        with self.conexion() as conexion:
+            conexion.execute(
+                'INSERT INTO consumos (id, fecha, fecha_orden, habitacion, pasajero, categoria, monto) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (id_consumo, registro['fecha'], fecha_orden(registro['fecha']), int(registro['habitacion']),
+                 registro['pasajero'], registro['categoria'], float(registro['monto']))
+            )
+        metricas.contar('recepcion_libro_filas_escritas_total', almacen='sqlite')
+        return id_consumo
+
+    def registrar_consumos(self, registros):
+        """Agrega varios consumos en una sola transacción; retorna sus ids"""
+        ids = [registro.get('id') or libro_consumos.nuevo_id() for registro in registros]
+        with self.conexion() as conexion:
+            conexion.executemany(
+                'INSERT INTO consumos (id, fecha, fecha_orden, habitacion, pasajero, categoria, monto) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(id_consumo, registro['fecha'], fecha_orden(registro['fecha']), int(registro['habitacion']),
+                  registro['pasajero'], registro['categoria'], float(registro['monto']))
+                 for id_consumo, registro in zip(ids, registros)]
+            )
+        metricas.contar('recepcion_libro_filas_escritas_total', len(ids), almacen='sqlite')
+        return ids
+
+    def version(self):
+        """Versión de los consumos (cambia con cada alta, baja o reinicio)"""
+        return self.conexion().execute('SELECT numero FROM version_consumos WHERE id = 1').fetchone()[0]
+
+    def listar_consumos(self):
+        df = pd.read_sql_query(
+            'SELECT id, fecha, habitacion, pasajero, categoria, monto FROM consumos ORDER BY rowid',
+            self.conexion()
+        )
+        metricas.contar('recepcion_libro_filas_leidas_total', len(df), almacen='sqlite')
+        return df
+
+    def pagina_consumos(self, filtros, desde, cantidad):
+        """(total, filas) del historial filtrado, resuelto con los índices de la base"""
+        condiciones = []
+        parametros = []
+        if filtros.get('habitacion') is not None:
+            condiciones.append('habitacion = ?')
+            parametros.append(int(filtros['habitacion']))
+        if filtros.get('categoria'):
+            condiciones.append('categoria = ?')
+            parametros.append(filtros['categoria'])
+        if filtros.get('desde'):
+            condiciones.append('fecha_orden >= ?')
+            parametros.append(filtros['desde'].isoformat())
+        if filtros.get('hasta'):
+            condiciones.append('fecha_orden < ?')
+            parametros.append((filtros['hasta'] + timedelta(days=1)).isoformat())
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        conexion = self.conexion()
+        total = conexion.execute(f'SELECT COUNT(*) FROM consumos{where}', parametros).fetchone()[0]
+        consulta = conexion.execute(
+            f'SELECT id, fecha, habitacion, pasajero, categoria, monto FROM consumos{where} '
+            'ORDER BY rowid LIMIT ? OFFSET ?',
+            parametros + [cantidad, desde]
+        )
+        metricas.contar('recepcion_libro_filas_leidas_total', min(cantidad, max(total - desde, 0)), almacen='sqlite')
+        # Generador: las filas se leen de la base a medida que se renderizan
+        return total, (dict(zip(libro_consumos.COLUMNAS_CONSUMOS, fila)) for fila in consulta)
+
+    def eliminar_consumo(self, id_consumo):
+        with self.conexion() as conexion:
+            fila = conexion.execute(
+                'SELECT id, fecha, habitacion, pasajero, categoria, monto FROM consumos WHERE id = ?',
+                (id_consumo,)
+            ).fetchone()
+            if fila is None:
+                return None
+            conexion.execute('DELETE FROM consumos WHERE id = ?', (id_consumo,))
+        return dict(zip(libro_consumos.COLUMNAS_CONSUMOS, fila))
+
+    def tabla_totales(self, categorias):
+        filas = {}
+        consulta = self.conexion().execute(
+            'SELECT habitacion, pasajero, categoria, SUM(monto) FROM consumos '
+            'GROUP BY habitacion, pasajero, categoria'
+        )
+        for habitacion, pasajero, categoria, monto in consulta:
+            filas.setdefault((habitacion, pasajero), {})[categoria] = round(monto, 2)
+        return libro_consumos.armar_tabla_totales(filas, categorias)
+
+    def folio(self, habitacion):
+        """(consumos vigentes de la habitación, {categoria: total}), por el índice de habitación"""
+        conexion = self.conexion()
+        consumos = [
+            dict(zip(libro_consumos.COLUMNAS_CONSUMOS, fila)) for fila in conexion.execute(
+                'SELECT id, fecha, habitacion, pasajero, categoria, monto FROM consumos '
+                'WHERE habitacion = ? ORDER BY rowid', (int(habitacion),))
+        ]
+        metricas.contar('recepcion_libro_filas_leidas_total', len(consumos), almacen='sqlite')
+        totales = {
+            categoria: round(monto, 2) for categoria, monto in conexion.execute(
+                'SELECT categoria, SUM(monto) FROM consumos WHERE habitacion = ? GROUP BY categoria',
+                (int(habitacion),))
+        }
+        return consumos, totales
+
+    def archivar_temporada(self, etiqueta='reinicio_temporada'):
+        """
+        Guarda una copia de la base (con los consumos de la temporada) en el
+        almacén de respaldos y vacía la tabla. Retorna la entrada del respaldo,
+        que se restaura sobre ruta_db.
+        """
+        conexion = self.conexion()
+        with tempfile.TemporaryDirectory() as carpeta:
+            copia = os.path.join(carpeta, os.path.basename(self.ruta_db))
+            # Con el bloqueo de escritura tomado ningún consumo se carga entre la
+            # copia y el borrado. La copia se lee con otra conexión: en WAL los
+            # lectores no esperan al escritor (backup() desde la conexión con la
+            # transacción abierta se bloquea)
+            conexion.execute('BEGIN IMMEDIATE')
+            try:
+                origen = sqlite3.connect(self.ruta_db, timeout=30)
+                destino = sqlite3.connect(copia)
+                try:
+                    origen.backup(destino)
+                finally:
+                    destino.close()
+                    origen.close()
+                entrada = respaldos.respaldar(copia, etiqueta, nombre=self.ruta_db)
+                conexion.execute('DELETE FROM consumos')
+            except Exception:
+                conexion.rollback()
+                raise
+            conexion.commit()
+        return entrada
+
+    def importar_csv(self, ruta_pasajeros=DB_PASAJEROS, ruta_consumos=libro_consumos.DB_CONSUMOS):
+        """
+        Carga pasajeros.csv (reemplaza los pasajeros activos) y el libro de
+        consumos CSV. Los consumos ya importados (mismo id) no se duplican.
+        Retorna (pasajeros, consumos) importados.
+        """
+        total_pasajeros = 0
+        total_consumos = 0
+        with self.conexion() as conexion:
+            if os.path.exists(ruta_pasajeros):
+                df_pasajeros = pd.read_csv(ruta_pasajeros, dtype=str)
+                df_pasajeros['Nro. habitación'] = pd.to_numeric(df_pasajeros['Nro. habitación'], errors='coerce')
+                df_pasajeros = df_pasajeros.dropna(subset=['Nro. habitación'])
+                conexion.execute('DELETE FROM pasajeros')
+                conexion.executemany(
+                    'INSERT INTO pasajeros (habitacion, nombre, nro_doc, fecha_ingreso, fecha_egreso) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    zip(df_pasajeros['Nro. habitación'].astype(int).tolist(), df_pasajeros['Apellido y nombre'],
+                        df_pasajeros['Nro. doc.'], df_pasajeros['Fecha de ingreso'],
+                        df_pasajeros['Fecha de egreso'])
+                )
+                total_pasajeros = len(df_pasajeros)
+
+            if os.path.exists(ruta_consumos):
+                df = libro_consumos.leer_consumos()
+                cursor = conexion.executemany(
+                    'INSERT OR IGNORE INTO consumos (id, fecha, fecha_orden, habitacion, pasajero, categoria, monto) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    zip(df['id'], df['fecha'], df['fecha'].map(fecha_orden), df['habitacion'].astype(int).tolist(),
+                        df['pasajero'], df['categoria'], df['monto'].astype(float).tolist())
+                )
+                total_consumos = cursor.rowcount
+        return total_pasajeros, total_consumos
+
+_almacen = {}
+_lock_almacen = threading.Lock()
+
+def obtener_almacen():
+    """Retorna el backend configurado en RECEPCION_ALMACEN (una instancia por proceso)"""
+    nombre = os.environ.get('RECEPCION_ALMACEN', 'csv').lower()
+    with _lock_almacen:
+        if nombre not in _almacen:
+            if nombre == 'sqlite':
+                _almacen[nombre] = AlmacenSQLite(os.environ.get('RECEPCION_SQLITE', DB_SQLITE))
+            elif nombre == 'csv':
+                if os.environ.get('RECEPCION_LOTE_MS') or os.environ.get('RECEPCION_LOTE_FILAS'):
+                    libro_consumos.activar_escritura_por_lotes(
+                        max_filas=int(os.environ.get('RECEPCION_LOTE_FILAS', 50)),
+                        intervalo_ms=int(os.environ.get('RECEPCION_LOTE_MS', 200))
+                    )
+                _almacen[nombre] = AlmacenCSV()
+            else:
+                raise ValueError(f"Backend de almacenamiento desconocido: '{nombre}' (use csv o sqlite)")
+        return _almacen[nombre]
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'importar':
+        print("Uso:")
+        print("  python almacenamiento.py importar [recepcion.db]")
+        sys.exit(1)
+
+    ruta_db = sys.argv[2] if len(sys.argv) > 2 else DB_SQLITE
+    print(f"📥 Importando {DB_PASAJEROS} y {libro_consumos.DB_CONSUMOS} a {ruta_db}...")
+    pasajeros, consumos = AlmacenSQLite(ruta_db).importar_csv()
+    print(f"✅ Pasajeros activos: {pasajeros}")
+    print(f"✅ Consumos importados: {consumos}")
+    print("\nPara usarla: RECEPCION_ALMACEN=sqlite python app.py")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,106 @@
-from flask import Flask, render_template, request, redirect, flash, send_file
-import pandas as pd
+from flask import Flask, render_template, stream_template, request, redirect, flash, get_flashed_messages, send_file, jsonify
+import openpyxl
+import hashlib
+import math
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-import sys
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+import metricas
+from almacenamiento import obtener_almacen
+from libro_consumos import FORMATO_FECHA
 
 app = Flask(__name__)
 app.secret_key = 'temporada_2026_recepcion_key_secreta'
 
-# Archivos de datos
-DB_PASAJEROS = 'pasajeros.csv'
-DB_CONSUMOS = 'consumos_diarios.csv'
+# Latencia por ruta, fases internas y filas del libro, en /metrics (ver metricas.py)
+metricas.instrumentar(app)
+
+# Backend de datos (CSV por defecto, SQLite con RECEPCION_ALMACEN=sqlite)
+almacen = obtener_almacen()
+
+# Categorías que se informan en los cierres
+CATEGORIAS_CIERRE = ['Bebidas', 'Estadía', 'Map']
+
+# Filas mínimas de la planilla de salidas (encabezado incluido)
+FILAS_MINIMAS_SALIDAS = 30
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Paginación del historial de consumos
+TAMANIO_PAGINA = 50
+TAMANIO_PAGINA_MAXIMO = 500
+
+# Cargas por lote (/api/consumos/batch): columnas que se leen y tope de filas por pedido
+COLUMNAS_LOTE = ['habitacion', 'categoria', 'monto', 'fecha']
+FILAS_LOTE_MAXIMO = 5000
+
+# Cierres que se arman a la vez en cada proceso (tope de concurrencia: el
+# pedido espera su cierre). El resto de los hilos del servidor queda libre
+# para cargar consumos mientras la auditoría pide reportes
+REPORTES_SIMULTANEOS = int(os.environ.get('RECEPCION_REPORTES_SIMULTANEOS', 2))
+_reportes_en_curso = threading.BoundedSemaphore(REPORTES_SIMULTANEOS)
+
+# Cierres ya armados, en memoria: {(reporte, versión de los consumos, día): (etag, contenido)}
+# Se descartan los menos usados cuando hay más de CACHE_REPORTES_MAXIMO
+CACHE_REPORTES_MAXIMO = 16
+_cache_reportes = OrderedDict()
+_lock_cache_reportes = threading.Lock()
+
+def _entero(valor, defecto):
+    """Convierte un parámetro a entero, o retorna el valor por defecto"""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return defecto
+
+def _fecha(valor):
+    """Convierte un parámetro 'aaaa-mm-dd' a fecha, o None si no es válido"""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+def generar_reporte(funcion, *args):
+    """
+    Arma un reporte en el hilo del pedido y retorna el resultado. No es
+    asincrónico: solo limita a REPORTES_SIMULTANEOS los cierres que se arman
+    a la vez; los pedidos que exceden el tope esperan su turno.
+    """
+    with _reportes_en_curso:
+        return funcion(*args)
+
+def reporte_cacheado(nombre, generar):
+    """
+    Retorna (etag, bytes) del reporte. Mientras no cambien los consumos
+    (almacen.version()) ni el día, se sirve el ya armado sin recalcular.
+    """
+    clave = (nombre, almacen.version(), datetime.now().strftime('%Y-%m-%d'))
+    with _lock_cache_reportes:
+        if clave in _cache_reportes:
+            _cache_reportes.move_to_end(clave)
+            return _cache_reportes[clave]
+
+    # La versión se leyó antes de armarlo: el contenido nunca es más viejo que su clave
+    contenido = generar_reporte(generar)
+    entrada = (hashlib.sha256(contenido).hexdigest()[:32], contenido)
+    with _lock_cache_reportes:
+        _cache_reportes[clave] = entrada
+        while len(_cache_reportes) > CACHE_REPORTES_MAXIMO:
+            _cache_reportes.popitem(last=False)
+    return entrada
 
 def validar_pasajero(habitacion):
     """
-    Verifica que la habitación exista en el CSV de pasajeros activos.
+    Verifica que la habitación exista entre los pasajeros activos.
     Retorna el nombre del pasajero si existe, None si no.
     """
-    if not os.path.exists(DB_PASAJEROS):
-        return None
-    
-    df_pasajeros = pd.read_csv(DB_PASAJEROS)
-    pasajero = df_pasajeros[df_pasajeros['Nro. habitación'] == int(habitacion)]
-    
-    if pasajero.empty:
-        return None
-    
-    return pasajero.iloc[0]['Apellido y nombre']
+    with metricas.fase('lectura'):
+        return almacen.buscar_pasajero(habitacion)
 
 @app.route('/')
 def index():
@@ -59,124 +134,213 @@ def cargar_consumo():
         'monto': float(monto)
     }
     
-    # Guardar en el CSV
-    df_nuevo = pd.DataFrame([nuevo_registro])
-    
-    if os.path.exists(DB_CONSUMOS):
-        df_nuevo.to_csv(DB_CONSUMOS, mode='a', header=False, index=False)
-    else:
-        df_nuevo.to_csv(DB_CONSUMOS, mode='w', header=True, index=False)
+    # Guardar el consumo (actualiza también los totales por habitación)
+    with metricas.fase('escritura'):
+        almacen.registrar_consumo(nuevo_registro)
     
     flash(f'✅ Consumo registrado: {categoria} - ${monto} para {nombre_pasajero} (Hab. {habitacion})', 'success')
     return redirect('/')
 
+def leer_lote_consumos():
+    """
+    Filas del lote como DataFrame: lista JSON de consumos (o {"consumos": [...]}),
+    CSV subido en el campo 'archivo' o cuerpo text/csv.
+    Lanza ValueError si el pedido no trae un lote legible.
+    """
+    if request.is_json:
+        datos = request.get_json(silent=True)
+        if isinstance(datos, dict):
+            datos = datos.get('consumos')
+        if not isinstance(datos, list) or not all(isinstance(fila, dict) for fila in datos):
+            raise ValueError('Se esperaba una lista JSON de consumos')
+        lote = pd.DataFrame(datos)
+    elif 'archivo' in request.files:
+        lote = pd.read_csv(request.files['archivo'], dtype=str, keep_default_na=False)
+    elif request.mimetype == 'text/csv':
+        lote = pd.read_csv(BytesIO(request.get_data()), dtype=str, keep_default_na=False)
+    else:
+        raise ValueError('Enviar una lista JSON o un CSV (campo "archivo" o cuerpo text/csv)')
+    return lote.reindex(columns=COLUMNAS_LOTE).reset_index(drop=True)
+
+def validar_lote(lote):
+    """
+    Valida todas las filas del lote de una vez (por columnas, con una sola
+    consulta de pasajeros). Retorna el lote con habitación, monto y fecha
+    normalizados, el pasajero y el 'motivo' de rechazo (None si se acepta).
+    """
+    habitaciones = pd.to_numeric(lote['habitacion'], errors='coerce')
+    habitacion_valida = habitaciones.notna() & (habitaciones % 1 == 0)
+    pasajeros = almacen.buscar_pasajeros(set(habitaciones[habitacion_valida].astype(int)))
+
+    montos = pd.to_numeric(lote['monto'], errors='coerce')
+    categorias = lote['categoria'].astype('string').str.strip()
+    fechas_texto = lote['fecha'].astype('string').str.strip().replace('', pd.NA)
+    fechas = pd.to_datetime(fechas_texto, format=FORMATO_FECHA, errors='coerce')
+
+    validado = pd.DataFrame({
+        'habitacion': habitaciones,
+        'pasajero': habitaciones.where(habitacion_valida).map(pasajeros),
+        'categoria': categorias,
+        'monto': montos,
+        # Sin fecha, el consumo se registra con la hora de la carga
+        'fecha': fechas.dt.strftime(FORMATO_FECHA).fillna(datetime.now().strftime(FORMATO_FECHA)),
+    })
+    # Vale el primer motivo que corresponda a cada fila
+    validado['motivo'] = np.select(
+        [
+            ~habitacion_valida,
+            validado['pasajero'].isna(),
+            ~categorias.isin(CATEGORIAS_CIERRE).fillna(False).astype(bool),
+            ~np.isfinite(montos),
+            fechas_texto.notna() & fechas.isna(),
+        ],
+        [
+            'Habitación inválida',
+            'Habitación no registrada',
+            f"Categoría inválida (opciones: {', '.join(CATEGORIAS_CIERRE)})",
+            'Monto inválido',
+            'Fecha inválida (formato dd/mm/aaaa hh:mm)',
+        ],
+        default=None
+    )
+    return validado
+
+@app.route('/api/consumos/batch', methods=['POST'])
+def cargar_lote():
+    """
+    Carga por lote (cierre de turno del bar o del punto de venta): valida todas
+    las filas juntas, escribe las aceptadas en una sola escritura y responde
+    con el resultado de cada fila.
+    """
+    try:
+        with metricas.fase('lectura'):
+            lote = leer_lote_consumos()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(lote) > FILAS_LOTE_MAXIMO:
+        return jsonify({'error': f'El lote supera el máximo de {FILAS_LOTE_MAXIMO} filas'}), 413
+
+    with metricas.fase('validacion'):
+        validado = validar_lote(lote)
+    aceptados = validado[validado['motivo'].isna()]
+    with metricas.fase('escritura'):
+        ids = almacen.registrar_consumos([
+            {
+                'fecha': fila.fecha,
+                'habitacion': int(fila.habitacion),
+                'pasajero': fila.pasajero,
+                'categoria': fila.categoria,
+                'monto': float(fila.monto)
+            }
+            for fila in aceptados.itertuples()
+        ])
+    id_por_fila = dict(zip(aceptados.index, ids))
+
+    # Las filas se numeran desde 1, en el orden del lote
+    filas = [
+        {'fila': indice + 1, 'estado': 'aceptado', 'id': id_por_fila[indice]} if pd.isna(motivo)
+        else {'fila': indice + 1, 'estado': 'rechazado', 'motivo': motivo}
+        for indice, motivo in zip(validado.index, validado['motivo'])
+    ]
+    return jsonify({'aceptados': len(ids), 'rechazados': len(filas) - len(ids), 'filas': filas})
+
+def generar_consulta_csv():
+    """Tabla de cierre (habitación × categoría con total) como CSV, en bytes"""
+    with metricas.fase('pivot'):
+        # 1-3. Totales precalculados: Habitaciones como filas, las 3 categorías como columnas
+        tabla_cierre = almacen.tabla_totales(CATEGORIAS_CIERRE)
+        
+        # 4. Seleccionar solo las columnas que nos interesan
+        tabla_cierre = tabla_cierre[CATEGORIAS_CIERRE]
+
+        # 5. Calcular el total acumulado por habitación
+        tabla_cierre['TOTAL_GENERAL'] = tabla_cierre.sum(axis=1)
+
+    # 6. CSV en memoria (sin archivo temporal compartido entre descargas)
+    with metricas.fase('serializacion'):
+        return tabla_cierre.to_csv().encode('utf-8')
+
 @app.route('/cierre-dia')
 def cierre_dia():
     """Generar archivo de consulta de consumos agrupados por categoría (CSV)"""
-    if not os.path.exists(DB_CONSUMOS):
+    if not almacen.hay_consumos():
         flash("No hay consumos registrados para realizar el cierre.", "warning")
         return redirect('/')
 
-    # 1. Leer los consumos registrados
-    df = pd.read_csv(DB_CONSUMOS)
+    # 1-6. Tabla de cierre en CSV (del cache si los consumos no cambiaron)
+    etag, contenido = reporte_cacheado('cierre-dia', generar_consulta_csv)
 
-    # 2. Pivotear datos: Habitaciones como filas, solo 3 categorías como columnas
-    tabla_cierre = df.pivot_table(
-        index=['habitacion', 'pasajero'], 
-        columns='categoria', 
-        values='monto', 
-        aggfunc='sum', 
-        fill_value=0
-    )
+    # Con If-None-Match igual al etag se responde 304 sin reenviar el archivo
+    return send_file(BytesIO(contenido), as_attachment=True, etag=etag,
+                     download_name=f"consulta_consumos_{datetime.now().strftime('%d-%m-%Y')}.csv")
+
+def generar_salidas_xlsx(tabla_pivot, fecha):
+    """
+    Arma el archivo de salidas (replica salidas.xlsx) a partir de la tabla de
+    totales por habitación y lo retorna como BytesIO listo para enviar.
+    Tiene una fila por habitación con consumos (sin tope) y, si son pocas,
+    se completa con filas vacías hasta FILAS_MINIMAS_SALIDAS.
+    """
+    # Columnas de montos: celda vacía cuando la categoría no tiene consumos
+    columnas = {'HAB': tabla_pivot['habitacion'].astype(int).tolist()}
+    for categoria in ['Estadía', 'Map', 'Bebidas']:
+        montos = tabla_pivot[categoria].astype(float)
+        columnas[categoria] = montos.astype(object).where(montos > 0, None).tolist()
+    columnas['Forma de pago'] = [None] * len(tabla_pivot)
+    columnas['Total'] = (tabla_pivot['Estadía'] + tabla_pivot['Map'] + tabla_pivot['Bebidas']).astype(float).tolist()
     
-    # 3. Asegurar que existan las 3 columnas principales
-    for col in ['Bebidas', 'Estadía', 'Map']:
-        if col not in tabla_cierre.columns:
-            tabla_cierre[col] = 0
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
     
-    # 4. Seleccionar solo las columnas que nos interesan
-    columnas_orden = ['Bebidas', 'Estadía', 'Map']
-    tabla_cierre = tabla_cierre[columnas_orden]
-
-    # 5. Calcular el total acumulado por habitación
-    tabla_cierre['TOTAL_GENERAL'] = tabla_cierre.sum(axis=1)
-
-    # 6. Guardar temporalmente para la descarga
-    archivo_salida = 'consulta_consumos.csv'
-    tabla_cierre.to_csv(archivo_salida)
+    # Encabezado (filas 1 a 7)
+    ws.append(['Pase de caja e información a turno mañana'])
+    ws.append([])
+    ws.append([None, None, 'Turno:   00 A 08 HS'])
+    ws.append([None, None, None, None, f'Fecha: {fecha.strftime("%Y-%m-%d")}'])
+    ws.append(['Detalle a cobrar de habitaciones con salida'])
+    ws.append(['HAB', 'Estadía', 'Map', 'Bebidas', 'Forma de pago', 'Total'])
+    ws.append([])
+    
+    # Datos de habitaciones - Cada categoría en su columna
+    for fila in zip(*columnas.values()):
+        ws.append(fila)
+    
+    # Rellenar filas vacías
+    for _ in range(FILAS_MINIMAS_SALIDAS - 7 - len(tabla_pivot)):
+        ws.append([None, None, None, None, None, 0.0])
+    
+    archivo = BytesIO()
+    with metricas.fase('serializacion'):
+        wb.save(archivo)
+    archivo.seek(0)
+    return archivo
 
-    return send_file(archivo_salida, as_attachment=True, download_name=f"consulta_consumos_{datetime.now().strftime('%d-%m-%Y')}.csv")
+def generar_salidas_del_dia():
+    """Archivo de salidas del día (XLSX) a partir de los totales precalculados, en bytes"""
+    with metricas.fase('pivot'):
+        tabla_pivot = almacen.tabla_totales(CATEGORIAS_CIERRE).reset_index()
+    return generar_salidas_xlsx(tabla_pivot, datetime.now()).getvalue()
 
 @app.route('/cierre-xlsx')
 def cierre_xlsx():
     """Generar archivo de salidas en formato XLSX (Excel) - Cada categoría en su columna"""
-    if not os.path.exists(DB_CONSUMOS):
+    if not almacen.hay_consumos():
         flash("No hay consumos registrados para generar el archivo de salidas.", "warning")
         return redirect('/')
     
     try:
-        # Leer consumos
-        df_consumos = pd.read_csv(DB_CONSUMOS)
-        
-        # Crear tabla pivote: habitaciones en filas, categorías en columnas
-        tabla_pivot = df_consumos.pivot_table(
-            index=['habitacion', 'pasajero'],
-            columns='categoria',
-            values='monto',
-            aggfunc='sum',
-            fill_value=0
-        ).reset_index()
-        
-        # Asegurar que existan todas las columnas (aunque estén vacías)
-        for col in ['Estadía', 'Map', 'Bebidas']:
-            if col not in tabla_pivot.columns:
-                tabla_pivot[col] = 0
-        
-        # Calcular total por habitación
-        tabla_pivot['Total'] = tabla_pivot['Estadía'] + tabla_pivot['Map'] + tabla_pivot['Bebidas']
-        
-        # Crear estructura del archivo (replica salidas.xlsx)
-        max_filas = 30
-        data = [[None] * 6 for _ in range(max_filas)]
-        
-        # Fila 0: Título
-        data[0] = ['Pase de caja e información a turno mañana', None, None, None, None, None]
-        data[2] = [None, None, 'Turno:   00 A 08 HS', None, None, None]
-        data[3] = [None, None, None, None, f'Fecha: {datetime.now().strftime("%Y-%m-%d")}', None]
-        data[4] = ['Detalle a cobrar de habitaciones con salida', None, None, None, None, None]
-        data[5] = ['HAB', 'Estadía', 'Map', 'Bebidas', 'Forma de pago', 'Total']
-        data[6] = [None, None, None, None, None, None]
-        
-        # Datos de habitaciones - Cada categoría en su columna
-        fila_actual = 7
-        for idx, row in tabla_pivot.iterrows():
-            habitacion = row['habitacion']
-            estadia = row['Estadía'] if row['Estadía'] > 0 else None
-            map_val = row['Map'] if row['Map'] > 0 else None
-            bebidas = row['Bebidas'] if row['Bebidas'] > 0 else None
-            total = row['Total']
-            
-            # Distribuir valores en sus respectivas columnas
-            data[fila_actual] = [
-                int(habitacion),  # HAB (col 0)
-                estadia,          # Estadía (col 1)
-                map_val,          # Map (col 2)
-                bebidas,          # Bebidas (col 3)
-                None,             # Forma de pago (col 4)
-                total             # Total (col 5)
-            ]
-            fila_actual += 1
-        
-        # Rellenar filas vacías
-        for i in range(fila_actual, max_filas):
-            data[i] = [None, None, None, None, None, 0.0]
+        # Totales precalculados (habitaciones en filas, categorías en columnas) y
+        # XLSX en memoria (no queda ningún salidas_*.xlsx en disco), del cache si
+        # los consumos no cambiaron
+        etag, contenido = reporte_cacheado('cierre-xlsx', generar_salidas_del_dia)
         
-        # Guardar como XLSX
-        df_salidas = pd.DataFrame(data)
-        archivo_salida = f'salidas_{datetime.now().strftime("%d-%m-%Y")}.xlsx'
-        df_salidas.to_excel(archivo_salida, engine='openpyxl', index=False, header=False)
-        
-        return send_file(archivo_salida, as_attachment=True)
+        return send_file(
+            BytesIO(contenido),
+            as_attachment=True,
+            download_name=f'salidas_{datetime.now().strftime("%d-%m-%Y")}.xlsx',
+            mimetype=MIMETYPE_XLSX,
+            etag=etag
+        )
         
     except Exception as e:
         flash(f"Error al generar archivo Excel: {str(e)}", "danger")
@@ -184,8 +348,8 @@ def cierre_xlsx():
 
 @app.route('/ver-consumos')
 def ver_consumos():
-    """Vista de todos los consumos registrados con opción de eliminar"""
-    if not os.path.exists(DB_CONSUMOS):
+    """Vista paginada y filtrable de los consumos registrados con opción de eliminar"""
+    if not almacen.hay_consumos():
         return """
         <!DOCTYPE html>
         <html>
@@ -204,107 +368,87 @@ def ver_consumos():
         </html>
         """
     
-    df = pd.read_csv(DB_CONSUMOS)
-    
-    # Construir tabla HTML con botón de eliminar
-    html = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-        <title>Consumos Registrados</title>
-        <script>
-            function confirmarEliminacion(indice) {
-                if (confirm('¿Estás seguro de eliminar este consumo?\\nEsta acción no se puede deshacer.')) {
-                    window.location.href = '/eliminar-consumo/' + indice;
-                }
-            }
-        </script>
-        <style>
-            .btn-eliminar { font-size: 0.8rem; padding: 0.25rem 0.5rem; }
-        </style>
-    </head>
-    <body>
-        <div class="container mt-5">
-            <h2>Historial de Consumos</h2>
-            <p class="text-muted">Total de registros: """ + str(len(df)) + """</p>
-            
-            <div class="table-responsive">
-                <table class="table table-striped table-hover">
-                    <thead class="table-dark">
-                        <tr>
-                            <th>#</th>
-                            <th>Fecha</th>
-                            <th>Habitación</th>
-                            <th>Pasajero</th>
-                            <th>Categoría</th>
-                            <th>Monto</th>
-                            <th>Acción</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-    """
-    
-    for idx, row in df.iterrows():
-        html += f"""
-                        <tr>
-                            <td>{idx + 1}</td>
-                            <td>{row['fecha']}</td>
-                            <td>{row['habitacion']}</td>
-                            <td>{row['pasajero']}</td>
-                            <td><span class="badge bg-primary">{row['categoria']}</span></td>
-                            <td>${row['monto']:.2f}</td>
-                            <td>
-                                <button onclick="confirmarEliminacion({idx})" class="btn btn-danger btn-sm btn-eliminar">
-                                    🗑️ Eliminar
-                                </button>
-                            </td>
-                        </tr>
-        """
+    # Filtros y página pedidos (valores inválidos se ignoran)
+    filtros = {
+        'habitacion': _entero(request.args.get('habitacion'), None),
+        'categoria': request.args.get('categoria') or None,
+        'desde': _fecha(request.args.get('desde')),
+        'hasta': _fecha(request.args.get('hasta'))
+    }
+    tamanio = min(max(_entero(request.args.get('tamanio'), TAMANIO_PAGINA), 1), TAMANIO_PAGINA_MAXIMO)
+    pagina = max(_entero(request.args.get('pagina'), 1), 1)
+    desde = (pagina - 1) * tamanio
     
-    html += """
-                    </tbody>
-                </table>
-            </div>
-            
-            <div class="mt-4">
-                <a href="/" class="btn btn-primary">Volver al Formulario</a>
-                <a href="/cierre-dia" class="btn btn-secondary">Descargar CSV</a>
-                <a href="/cierre-xlsx" class="btn btn-success">Descargar Excel</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    # Solo se leen las filas de la página; la respuesta se envía a medida que se renderiza
+    with metricas.fase('lectura'):
+        total, filas = almacen.pagina_consumos(filtros, desde, tamanio)
     
-    return html
+    # Los mensajes se sacan de la sesión antes de empezar a enviar: una vez que
+    # arranca el streaming la cookie ya salió y no se podrían marcar como leídos
+    mensajes = get_flashed_messages(with_categories=True)
 
-@app.route('/eliminar-consumo/<int:indice>')
-def eliminar_consumo(indice):
-    """Eliminar un consumo específico por su índice"""
-    if not os.path.exists(DB_CONSUMOS):
+    return metricas.medir_generador('render', stream_template(
+        'consumos.html',
+        mensajes=mensajes,
+        filas=filas,
+        total=total,
+        desde=desde,
+        pagina=pagina,
+        tamanio=tamanio,
+        tamanio_maximo=TAMANIO_PAGINA_MAXIMO,
+        total_paginas=max(math.ceil(total / tamanio), 1),
+        filtros=filtros,
+        parametros={clave: str(valor) for clave, valor in filtros.items() if valor is not None},
+        categorias=CATEGORIAS_CIERRE
+    ))
+
+def armar_folio(habitacion):
+    """Folio de la habitación: pasajero, consumos vigentes y totales por categoría"""
+    with metricas.fase('lectura'):
+        consumos, totales = almacen.folio(habitacion)
+    return {
+        'habitacion': habitacion,
+        'pasajero': validar_pasajero(habitacion),
+        'consumos': consumos,
+        'totales': {**{categoria: 0.0 for categoria in CATEGORIAS_CIERRE}, **totales},
+        'total': round(sum(totales.values()), 2)
+    }
+
+@app.route('/api/habitacion/<int:habitacion>/folio')
+def api_folio(habitacion):
+    """Lo que debe la habitación ahora (JSON), sin recorrer todo el libro de consumos"""
+    folio = armar_folio(habitacion)
+    if folio['pasajero'] is None and not folio['consumos']:
+        return jsonify({'error': f'La habitación {habitacion} no está registrada ni tiene consumos'}), 404
+    with metricas.fase('serializacion'):
+        return jsonify(folio)
+
+@app.route('/habitacion/<int:habitacion>/folio')
+def ver_folio(habitacion):
+    """Vista del folio de una habitación (para el checkout)"""
+    folio = armar_folio(habitacion)
+    with metricas.fase('render'):
+        return render_template('folio.html', folio=folio)
+
+@app.route('/eliminar-consumo/<id_consumo>')
+def eliminar_consumo(id_consumo):
+    """Eliminar un consumo específico por su id"""
+    if not almacen.hay_consumos():
         flash('No hay consumos para eliminar', 'warning')
         return redirect('/ver-consumos')
     
     try:
-        # Leer el archivo
-        df = pd.read_csv(DB_CONSUMOS)
+        # Eliminar la fila (descuenta también de los totales)
+        consumo_eliminado = almacen.eliminar_consumo(id_consumo)
         
-        # Verificar que el índice existe
-        if indice < 0 or indice >= len(df):
-            flash(f'❌ Índice inválido: {indice}', 'danger')
+        # Verificar que el consumo existe
+        if consumo_eliminado is None:
+            flash(f'❌ Consumo inexistente: {id_consumo}', 'danger')
             return redirect('/ver-consumos')
         
-        # Guardar información del consumo eliminado para mostrar
-        consumo_eliminado = df.iloc[indice]
+        # Información del consumo eliminado para mostrar
         info = f"Hab {consumo_eliminado['habitacion']} - {consumo_eliminado['categoria']} - ${consumo_eliminado['monto']}"
         
-        # Eliminar la fila
-        df = df.drop(indice)
-        
-        # Guardar el archivo actualizado
-        df.to_csv(DB_CONSUMOS, index=False)
-        
         flash(f'✅ Consumo eliminado correctamente: {info}', 'success')
         
     except Exception as e:
@@ -317,8 +461,12 @@ def reiniciar_temporada():
     """Archivar consumos actuales e iniciar nueva temporada de 5 días"""
     
     if request.method == 'GET':
-        # Mostrar página de confirmación
-        return """
+        # Mostrar página de confirmación (el archivo que se vacía depende del backend)
+        if almacen.nombre == 'sqlite':
+            archivo = f'La tabla de consumos de <code>{almacen.ruta_db}</code> se vaciará'
+        else:
+            archivo = 'El archivo <code>consumos_diarios.csv</code> se reiniciará vacío'
+        return f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -336,8 +484,8 @@ def reiniciar_temporada():
                         <hr>
                         <p><strong>¿Qué sucederá?</strong></p>
                         <ul>
-                            <li>Se creará un archivo de respaldo: <code>consumos_diarios_BACKUP_DD-MM-YYYY_HH-MM.csv</code></li>
-                            <li>El archivo <code>consumos_diarios.csv</code> se reiniciará vacío</li>
+                            <li>Los consumos se guardarán comprimidos en el almacén de respaldos (<code>respaldos/</code>)</li>
+                            <li>{archivo}</li>
                             <li>Las nuevas 40 habitaciones podrán empezar con cuenta en cero</li>
                         </ul>
                         <hr>
@@ -353,24 +501,21 @@ def reiniciar_temporada():
         """
     
     # POST: Ejecutar el reinicio
-    if not os.path.exists(DB_CONSUMOS):
+    if not almacen.hay_consumos():
         flash("No hay consumos para archivar. El sistema ya está limpio.", "info")
         return redirect('/')
     
     try:
-        # Crear nombre de archivo de backup con timestamp
-        timestamp = datetime.now().strftime('%d-%m-%Y_%H-%M')
-        archivo_backup = f'consumos_diarios_BACKUP_{timestamp}.csv'
-        
-        # Copiar el archivo actual al backup
-        import shutil
-        shutil.copy(DB_CONSUMOS, archivo_backup)
-        
-        # Reiniciar el archivo de consumos
-        with open(DB_CONSUMOS, 'w', encoding='utf-8') as f:
-            f.write('fecha,habitacion,pasajero,categoria,monto\n')
+        # Respaldar los consumos actuales y reiniciar el libro (y sus totales)
+        entrada = almacen.archivar_temporada()
         
-        flash(f'✅ Temporada reiniciada correctamente. Backup guardado en: {archivo_backup}', 'success')
+        # El respaldo se restaura sobre el archivo respaldado: el CSV del libro o
+        # la base SQLite, que solo se puede reemplazar con la app detenida
+        restaurar = f'python respaldos.py restaurar {entrada["hash"][:12]}'
+        if almacen.nombre == 'sqlite':
+            restaurar = 'detener la app y ' + restaurar
+        flash(f'✅ Temporada reiniciada correctamente. Respaldo {entrada["hash"][:12]} de '
+              f'{entrada["nombre"]} (restaurar con: {restaurar})', 'success')
         return redirect('/')
         
     except Exception as e:
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada ASGI de la app de consumos, para servirla con uvicorn:
+
+    uvicorn asgi:aplicacion --workers 3 --host 0.0.0.0 --port 5000
+
+Flask es WSGI: WsgiToAsgi atiende cada pedido en un hilo aparte, así el
+event loop del servidor sigue aceptando cargas de consumos mientras openpyxl
+arma un cierre. Con varios workers cada proceso tiene su propio tope de
+cierres simultáneos (app.REPORTES_SIMULTANEOS); el libro de consumos y la base SQLite
+ya toman bloqueos entre procesos.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+
+aplicacion = WsgiToAsgi(app)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del sistema de recepción.
+Genera pasajeros y consumos sintéticos a la escala pedida en una carpeta
+temporal (con una copia de la Grilla de Pax) y mide:
+
+  - importación de reservas (procesar_reservas.py)
+  - limpieza de grillas (limpiar_grillas_pisos.py)
+  - /cargar, /ver-consumos, /cierre-dia y /cierre-xlsx (cliente de prueba de Flask).
+    Los cierres se miden armándolos en cada pedido (vaciando el cache de
+    reportes) y servidos desde el cache (fases *_cacheado)
+
+Reporta tiempo y throughput de cada fase en JSON, para comparar corridas
+entre sí, junto con el RSS máximo acumulado del proceso al terminar cada fase
+(ru_maxrss: nunca baja, no es el pico de esa fase). Con --memoria mide además
+el pico de memoria de cada fase con tracemalloc (más lento: los tiempos de esas
+corridas solo se comparan entre sí).
+
+Uso:
+    python benchmark_recepcion.py --pasajeros 500 --cargas 200 --salida bench.json
+    python benchmark_recepcion.py --memoria --salida bench_memoria.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Los módulos del proyecto se importan desde esta carpeta aunque se trabaje en otra
+DIRECTORIO_PROYECTO = Path(__file__).resolve().parent
+sys.path.insert(0, str(DIRECTORIO_PROYECTO))
+
+import generar_consumos_prueba
+import libro_consumos
+from procesar_reservas import EXCEL_FILE, MAPPING, PISO_RANGES
+
+SERVICIOS = ['DESAYUNO', 'MEDIA PENSION', 'ALL INCLUSIVE']
+
+# Las grillas de piso tienen lugar para pocos pax por habitación: la
+# importación se mide con una ocupación realista (hasta 4 pax por habitación)
+PAX_MAXIMOS_POR_HABITACION = 4
+
+def rss_maximo_acumulado_mb():
+    """RSS máximo del proceso desde que arrancó (MB); no se reinicia entre fases"""
+    if resource is None:
+        return None
+    # Linux informa KB, macOS bytes
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def generar_pasajeros(cantidad, semilla):
+    """Pasajeros sintéticos con las columnas del export del PMS, repartidos en todas las habitaciones"""
+    rng = random.Random(semilla)
+    habitaciones = [hab for minimo, maximo in PISO_RANGES.values() for hab in range(minimo, maximo + 1)]
+    inicio_temporada = datetime(2026, 1, 2)
+
+    filas = []
+    for i in range(cantidad):
+        ingreso = inicio_temporada + timedelta(days=rng.randint(0, 60))
+        egreso = ingreso + timedelta(days=rng.randint(2, 7))
+        filas.append({
+            'Nro. habitación': habitaciones[i % len(habitaciones)],
+            'Fecha de ingreso': ingreso.strftime('%d/%m/%Y'),
+            'Fecha de egreso': egreso.strftime('%d/%m/%Y'),
+            'Plazas ocupadas': rng.randint(1, 4),
+            'Tipo documento': 'DNI',
+            'Nro. doc.': 20000000 + i,
+            'Apellido y nombre': f'PASAJERO {i:05d}',
+            'Edad': rng.randint(1, 90),
+            'Voucher': f'VOUCH-{i:05d}',
+            'Servicios': rng.choice(SERVICIOS),
+            'Estado': 'Confirmada',
+            'Paquete': 'Estandar',
+            'Sede': 'Villa Carlos Paz'
+        })
+    return pd.DataFrame(filas, columns=list(MAPPING.keys()))
+
+def preparar_datos(directorio, cantidad_pasajeros, semilla):
+    """
+    Escribe en el directorio de trabajo pasajeros.csv, el CSV de reservas a
+    importar, el libro de consumos y la copia de la grilla.
+    """
+    random.seed(semilla)
+    df_pasajeros = generar_pasajeros(cantidad_pasajeros, semilla)
+    df_pasajeros.to_csv(directorio / 'pasajeros.csv', index=False)
+
+    capacidad = PAX_MAXIMOS_POR_HABITACION * sum(maximo - minimo + 1 for minimo, maximo in PISO_RANGES.values())
+    df_reservas = df_pasajeros.head(capacidad)
+    df_reservas.to_csv(directorio / 'reservas.csv', index=False)
+
+    df_consumos = generar_consumos_prueba.generar_consumos(df_pasajeros, mostrar=False)
+    df_consumos.insert(0, 'id', [libro_consumos.nuevo_id() for _ in range(len(df_consumos))])
+    df_consumos.to_csv(directorio / libro_consumos.DB_CONSUMOS, index=False)
+
+    shutil.copy2(DIRECTORIO_PROYECTO / EXCEL_FILE, directorio / EXCEL_FILE)
+    return df_pasajeros, df_reservas, df_consumos
+
+def medir(resultados, fase, funcion, operaciones=1):
+    """
+    Ejecuta la fase (silenciando su salida) y agrega su medición a resultados.
+    Los scripts informan los errores retornando False: la fase falla con su salida.
+    """
+    salida = io.StringIO()
+    # Con --memoria (tracemalloc activo) el pico se reinicia para medir solo esta fase
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(salida):
+        exito = funcion()
+    segundos = time.perf_counter() - inicio
+    if exito is False:
+        raise RuntimeError(f"La fase {fase} falló:\n{salida.getvalue()}")
+
+    resultado = {
+        'fase': fase,
+        'segundos': round(segundos, 4),
+        'operaciones': operaciones,
+        'operaciones_por_segundo': round(operaciones / segundos, 2) if segundos > 0 else None,
+        'rss_maximo_acumulado_mb': rss_maximo_acumulado_mb()
+    }
+    if tracemalloc.is_tracing():
+        resultado['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    resultados.append(resultado)
+    print(f"   ⏱️  {fase}: {segundos:.3f} s ({operaciones} op.)", file=sys.stderr)
+
+def ejecutar(args):
+    directorio = Path(tempfile.mkdtemp(prefix='bench_recepcion_'))
+    directorio_original = os.getcwd()
+    resultados = []
+    try:
+        print(f"📂 Carpeta de trabajo: {directorio}", file=sys.stderr)
+        df_pasajeros, df_reservas, df_consumos = preparar_datos(directorio, args.pasajeros, args.semilla)
+        csv_reservas = str(directorio / 'reservas.csv')
+
+        # Los scripts y la app usan rutas relativas: se trabaja dentro de la carpeta temporal
+        os.chdir(directorio)
+        os.environ['RECEPCION_ALMACEN'] = args.almacen
+        if args.almacen == 'sqlite':
+            import almacenamiento
+            almacenamiento.AlmacenSQLite().importar_csv()
+
+        import procesar_reservas
+        import limpiar_grillas_pisos
+        import app as app_recepcion
+
+        if args.memoria:
+            tracemalloc.start()
+
+        medir(resultados, 'importar_reservas', lambda: procesar_reservas.procesar_reservas(csv_reservas),
+              len(df_reservas))
+        medir(resultados, 'limpiar_grillas', limpiar_grillas_pisos.limpiar_grillas)
+
+        cliente = app_recepcion.app.test_client()
+        rng = random.Random(args.semilla)
+        habitaciones = df_pasajeros['Nro. habitación'].tolist()
+        categorias = app_recepcion.CATEGORIAS_CIERRE
+
+        def cargar():
+            for _ in range(args.cargas):
+                cliente.post('/cargar', data={
+                    'habitacion': rng.choice(habitaciones),
+                    'categoria': rng.choice(categorias),
+                    'monto': rng.randint(500, 45000)
+                })
+
+        def pedir(url, sin_cache=False):
+            def _pedir():
+                for _ in range(args.repeticiones):
+                    if sin_cache:
+                        # Sin el cierre ya armado: cada pedido lo vuelve a generar
+                        with app_recepcion._lock_cache_reportes:
+                            app_recepcion._cache_reportes.clear()
+                    respuesta = cliente.get(url)
+                    respuesta.get_data()
+                    if respuesta.status_code != 200:
+                        raise RuntimeError(f"{url} respondió {respuesta.status_code}")
+            return _pedir
+
+        medir(resultados, 'cargar', cargar, args.cargas)
+        medir(resultados, 'ver_consumos', pedir('/ver-consumos'), args.repeticiones)
+        medir(resultados, 'cierre_dia', pedir('/cierre-dia', sin_cache=True), args.repeticiones)
+        medir(resultados, 'cierre_dia_cacheado', pedir('/cierre-dia'), args.repeticiones)
+        medir(resultados, 'cierre_xlsx', pedir('/cierre-xlsx', sin_cache=True), args.repeticiones)
+        medir(resultados, 'cierre_xlsx_cacheado', pedir('/cierre-xlsx'), args.repeticiones)
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        os.chdir(directorio_original)
+        if args.conservar:
+            print(f"📂 Datos conservados en: {directorio}", file=sys.stderr)
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {
+            'pasajeros': args.pasajeros,
+            'reservas_importadas': len(df_reservas),
+            'consumos_iniciales': len(df_consumos),
+            'cargas': args.cargas,
+            'repeticiones': args.repeticiones,
+            'almacen': args.almacen,
+            'semilla': args.semilla,
+            'memoria': args.memoria
+        },
+        'resultados': resultados
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de importación de reservas y de la app de consumos')
+    parser.add_argument('--pasajeros', type=int, default=200, help='Pasajeros sintéticos a generar (default: 200)')
+    parser.add_argument('--cargas', type=int, default=100, help='Consumos a cargar vía /cargar (default: 100)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Pedidos por cada ruta de consulta (default: 5)')
+    parser.add_argument('--almacen', choices=['csv', 'sqlite'], default='csv', help='Backend de datos de la app')
+    parser.add_argument('--semilla', type=int, default=2026, help='Semilla de los datos sintéticos')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el reporte (default: stdout)')
+    parser.add_argument('--conservar', action='store_true', help='No borrar la carpeta temporal al terminar')
+    parser.add_argument('--memoria', action='store_true',
+                        help='Medir el pico de memoria de cada fase con tracemalloc (hace más lentas las fases)')
+    args = parser.parse_args()
+
+    reporte = ejecutar(args)
+    texto = json.dumps(reporte, ensure_ascii=False, indent=2)
+    if args.salida:
+        Path(args.salida).write_text(texto + '\n', encoding='utf-8')
+        print(f"✅ Reporte guardado en {args.salida}", file=sys.stderr)
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 #!/usr/bin/env python3
 """
 Script para generar consumos de prueba simulando una temporada completa
+
+Uso:
+    python generar_consumos_prueba.py
+        Consumos para los pasajeros de pasajeros.csv (modo original)
+
+    python generar_consumos_prueba.py --vectorizado --temporadas 10 --habitaciones 500 --semilla 1
+        Temporadas sintéticas generadas con NumPy (reproducibles con --semilla),
+        escritas en orden cronológico por bloques al libro CSV o a SQLite (--destino)
 """
+import argparse
+import os
+import time
 import pandas as pd
+import numpy as np
 import random
 from datetime import datetime, timedelta
 
@@ -10,9 +22,6 @@ from datetime import datetime, timedelta
 DB_PASAJEROS = 'pasajeros.csv'
 DB_CONSUMOS = 'consumos_diarios.csv'
 
-# Leer pasajeros activos
-df_pasajeros = pd.read_csv(DB_PASAJEROS)
-
 # Categorías y rangos de precios realistas
 categorias_precios = {
     'Bebidas': (500, 3500),      # Bebidas desde $500 a $3500
@@ -20,87 +29,307 @@ categorias_precios = {
     'Map': (8000, 25000)          # Map desde $8000 a $25000
 }
 
-# Lista para acumular consumos
-consumos = []
-
-print("🏨 Generando consumos de prueba para la temporada...")
-print("=" * 60)
-
-# Generar consumos para cada pasajero
-for idx, pasajero in df_pasajeros.iterrows():
-    habitacion = pasajero['Nro. habitación']
-    nombre = pasajero['Apellido y nombre']
-    fecha_ingreso = datetime.strptime(pasajero['Fecha de ingreso'], '%d/%m/%Y')
-    fecha_egreso = datetime.strptime(pasajero['Fecha de egreso'], '%d/%m/%Y')
-    
-    # Calcular días de estadía
-    dias_estadia = (fecha_egreso - fecha_ingreso).days
-    
-    print(f"\n📋 Hab {habitacion} - {nombre}")
-    print(f"   Estadía: {dias_estadia} días ({fecha_ingreso.strftime('%d/%m')} al {fecha_egreso.strftime('%d/%m')})")
-    
-    # ESTADÍA: Siempre una vez al final
-    monto_estadia = random.randint(categorias_precios['Estadía'][0], categorias_precios['Estadía'][1])
-    fecha_estadia = fecha_egreso - timedelta(hours=random.randint(8, 12))
-    consumos.append({
-        'fecha': fecha_estadia.strftime('%d/%m/%Y %H:%M'),
-        'habitacion': habitacion,
-        'pasajero': nombre,
-        'categoria': 'Estadía',
-        'monto': monto_estadia
-    })
-    print(f"   ✅ Estadía: ${monto_estadia:,}")
-    
-    # MAP: 1-2 veces durante la estadía
-    if dias_estadia >= 2:
-        num_maps = random.randint(1, min(2, dias_estadia))
-        for i in range(num_maps):
-            dia_map = random.randint(0, dias_estadia - 1)
-            fecha_map = fecha_ingreso + timedelta(days=dia_map, hours=random.randint(12, 20))
-            monto_map = random.randint(categorias_precios['Map'][0], categorias_precios['Map'][1])
-            consumos.append({
-                'fecha': fecha_map.strftime('%d/%m/%Y %H:%M'),
-                'habitacion': habitacion,
-                'pasajero': nombre,
-                'categoria': 'Map',
-                'monto': monto_map
-            })
-        print(f"   ✅ Map: {num_maps} consumo(s)")
-    
-    # BEBIDAS: 2-5 consumos aleatorios durante la estadía
-    num_bebidas = random.randint(2, min(5, dias_estadia * 2))
-    total_bebidas = 0
-    for i in range(num_bebidas):
-        dia_bebida = random.randint(0, dias_estadia)
-        fecha_bebida = fecha_ingreso + timedelta(days=dia_bebida, hours=random.randint(10, 23), minutes=random.randint(0, 59))
-        monto_bebida = random.randint(categorias_precios['Bebidas'][0], categorias_precios['Bebidas'][1])
-        total_bebidas += monto_bebida
+def generar_consumos(df_pasajeros, mostrar=True):
+    """
+    Genera consumos realistas (Estadía, Map y Bebidas) para cada pasajero
+    durante su estadía. Retorna un DataFrame ordenado por fecha con las
+    columnas del libro de consumos (sin id).
+    """
+    # Lista para acumular consumos
+    consumos = []
+
+    if mostrar:
+        print("🏨 Generando consumos de prueba para la temporada...")
+        print("=" * 60)
+
+    # Generar consumos para cada pasajero
+    for idx, pasajero in df_pasajeros.iterrows():
+        habitacion = pasajero['Nro. habitación']
+        nombre = pasajero['Apellido y nombre']
+        fecha_ingreso = datetime.strptime(pasajero['Fecha de ingreso'], '%d/%m/%Y')
+        fecha_egreso = datetime.strptime(pasajero['Fecha de egreso'], '%d/%m/%Y')
+
+        # Calcular días de estadía
+        dias_estadia = (fecha_egreso - fecha_ingreso).days
+
+        if mostrar:
+            print(f"\n📋 Hab {habitacion} - {nombre}")
+            print(f"   Estadía: {dias_estadia} días ({fecha_ingreso.strftime('%d/%m')} al {fecha_egreso.strftime('%d/%m')})")
+
+        # ESTADÍA: Siempre una vez al final
+        monto_estadia = random.randint(categorias_precios['Estadía'][0], categorias_precios['Estadía'][1])
+        fecha_estadia = fecha_egreso - timedelta(hours=random.randint(8, 12))
         consumos.append({
-            'fecha': fecha_bebida.strftime('%d/%m/%Y %H:%M'),
+            'fecha': fecha_estadia.strftime('%d/%m/%Y %H:%M'),
             'habitacion': habitacion,
             'pasajero': nombre,
-            'categoria': 'Bebidas',
-            'monto': monto_bebida
+            'categoria': 'Estadía',
+            'monto': monto_estadia
         })
-    print(f"   ✅ Bebidas: {num_bebidas} consumo(s) - Total: ${total_bebidas:,}")
-
-# Ordenar por fecha
-df_consumos = pd.DataFrame(consumos)
-df_consumos['fecha_ordenamiento'] = pd.to_datetime(df_consumos['fecha'], format='%d/%m/%Y %H:%M')
-df_consumos = df_consumos.sort_values('fecha_ordenamiento')
-df_consumos = df_consumos.drop('fecha_ordenamiento', axis=1)
-
-# Guardar en CSV
-df_consumos.to_csv(DB_CONSUMOS, index=False)
-
-print("\n" + "=" * 60)
-print(f"✅ Se generaron {len(consumos)} consumos para {len(df_pasajeros)} habitaciones")
-print(f"📁 Archivo guardado: {DB_CONSUMOS}")
-print("\n📊 Resumen por categoría:")
-resumen = df_consumos.groupby('categoria')['monto'].agg(['count', 'sum'])
-for categoria, datos in resumen.iterrows():
-    print(f"   • {categoria}: {int(datos['count'])} consumos - Total: ${datos['sum']:,.0f}")
-
-print(f"\n💰 Total general: ${df_consumos['monto'].sum():,.0f}")
-print("=" * 60)
-print("\n🎯 Ahora puedes probar las funciones de cierre y exportación!")
+        if mostrar:
+            print(f"   ✅ Estadía: ${monto_estadia:,}")
+
+        # MAP: 1-2 veces durante la estadía
+        if dias_estadia >= 2:
+            num_maps = random.randint(1, min(2, dias_estadia))
+            for i in range(num_maps):
+                dia_map = random.randint(0, dias_estadia - 1)
+                fecha_map = fecha_ingreso + timedelta(days=dia_map, hours=random.randint(12, 20))
+                monto_map = random.randint(categorias_precios['Map'][0], categorias_precios['Map'][1])
+                consumos.append({
+                    'fecha': fecha_map.strftime('%d/%m/%Y %H:%M'),
+                    'habitacion': habitacion,
+                    'pasajero': nombre,
+                    'categoria': 'Map',
+                    'monto': monto_map
+                })
+            if mostrar:
+                print(f"   ✅ Map: {num_maps} consumo(s)")
+
+        # BEBIDAS: 2-5 consumos aleatorios durante la estadía
+        num_bebidas = random.randint(2, min(5, dias_estadia * 2))
+        total_bebidas = 0
+        for i in range(num_bebidas):
+            dia_bebida = random.randint(0, dias_estadia)
+            fecha_bebida = fecha_ingreso + timedelta(days=dia_bebida, hours=random.randint(10, 23), minutes=random.randint(0, 59))
+            monto_bebida = random.randint(categorias_precios['Bebidas'][0], categorias_precios['Bebidas'][1])
+            total_bebidas += monto_bebida
+            consumos.append({
+                'fecha': fecha_bebida.strftime('%d/%m/%Y %H:%M'),
+                'habitacion': habitacion,
+                'pasajero': nombre,
+                'categoria': 'Bebidas',
+                'monto': monto_bebida
+            })
+        if mostrar:
+            print(f"   ✅ Bebidas: {num_bebidas} consumo(s) - Total: ${total_bebidas:,}")
+
+    # Ordenar por fecha
+    df_consumos = pd.DataFrame(consumos)
+    df_consumos['fecha_ordenamiento'] = pd.to_datetime(df_consumos['fecha'], format='%d/%m/%Y %H:%M')
+    df_consumos = df_consumos.sort_values('fecha_ordenamiento')
+    df_consumos = df_consumos.drop('fecha_ordenamiento', axis=1)
+    return df_consumos
+
+# --------------------------------------------------------------------------
+# ⚡ MODO VECTORIZADO (pruebas de carga)
+# --------------------------------------------------------------------------
+
+# Fecha de inicio de la primera temporada sintética
+INICIO_TEMPORADAS = datetime(2026, 1, 2)
+
+# Textos de dos dígitos para armar fechas 'dd/mm/aaaa HH:MM' sin strftime fila por fila
+DOS_DIGITOS = np.array([f'{i:02d}' for i in range(100)], dtype=object)
+
+def habitaciones_sinteticas(cantidad):
+    """Las habitaciones reales del hotel y, si se piden más, números correlativos desde 1000"""
+    from procesar_reservas import PISO_RANGES
+    reales = [hab for minimo, maximo in PISO_RANGES.values() for hab in range(minimo, maximo + 1)]
+    if cantidad <= len(reales):
+        return np.array(reales[:cantidad])
+    return np.concatenate([reales, np.arange(1000, 1000 + cantidad - len(reales))])
+
+def _formatear_fechas(minutos):
+    """Convierte minutos desde 1970 a textos 'dd/mm/aaaa HH:MM' y 'aaaa-mm-dd HH:MM' (vectorizado)"""
+    instantes = minutos.astype('datetime64[m]')
+    dias = instantes.astype('datetime64[D]')
+    meses = instantes.astype('datetime64[M]')
+    anios = instantes.astype('datetime64[Y]')
+
+    dia = (dias - meses.astype('datetime64[D]')).astype(int) + 1
+    mes = (meses - anios.astype('datetime64[M]')).astype(int) + 1
+    anio = (anios.astype(int) + 1970).astype(str).astype(object)
+    hora, minuto = np.divmod((instantes - dias.astype('datetime64[m]')).astype(int), 60)
+    horario = ' ' + DOS_DIGITOS[hora] + ':' + DOS_DIGITOS[minuto]
+
+    fecha = DOS_DIGITOS[dia] + '/' + DOS_DIGITOS[mes] + '/' + anio + horario
+    fecha_orden = anio + '-' + DOS_DIGITOS[mes] + '-' + DOS_DIGITOS[dia] + horario
+    return fecha, fecha_orden
+
+def generar_temporada(rng, habitaciones, inicio, dias_temporada, primer_pasajero=0):
+    """
+    Genera con muestreo vectorizado los consumos de una temporada: cada
+    habitación encadena estadías de 2 a 7 días y cada estadía tiene una
+    Estadía al salir, 1-2 Map y de 2 a 5 Bebidas (mismas reglas que el modo original).
+    Retorna un DataFrame ordenado por fecha (con columna fecha_orden) y la
+    cantidad de estadías generadas.
+    """
+    # Estadías consecutivas por habitación que entran en la temporada
+    max_estadias = dias_temporada // 2 + 1
+    duraciones = rng.integers(2, 8, size=(len(habitaciones), max_estadias))
+    egresos = np.cumsum(duraciones, axis=1)
+    validas = egresos <= dias_temporada
+    fila_hab, _ = np.nonzero(validas)
+    dias_estadia = duraciones[validas]
+    egreso = egresos[validas]
+    ingreso = egreso - dias_estadia
+    estadias = len(dias_estadia)
+    nombres = np.array([f'PASAJERO {i:07d}' for i in range(primer_pasajero, primer_pasajero + estadias)],
+                       dtype=object)
+
+    # Cantidad de consumos de cada tipo por estadía
+    num_maps = rng.integers(1, 3, size=estadias)
+    num_bebidas = rng.integers(2, np.minimum(5, dias_estadia * 2) + 1)
+    idx_map = np.repeat(np.arange(estadias), num_maps)
+    idx_bebidas = np.repeat(np.arange(estadias), num_bebidas)
+
+    # Minuto de cada consumo, relativo al inicio de la temporada
+    minuto_estadia = egreso * 1440 - rng.integers(8, 13, size=estadias) * 60
+    minuto_map = ((ingreso[idx_map] + rng.integers(0, dias_estadia[idx_map])) * 1440
+                  + rng.integers(12, 21, size=len(idx_map)) * 60)
+    minuto_bebidas = ((ingreso[idx_bebidas] + rng.integers(0, dias_estadia[idx_bebidas] + 1)) * 1440
+                      + rng.integers(10, 24, size=len(idx_bebidas)) * 60
+                      + rng.integers(0, 60, size=len(idx_bebidas)))
+
+    def montos(categoria, cantidad):
+        minimo, maximo = categorias_precios[categoria]
+        return rng.integers(minimo, maximo + 1, size=cantidad)
+
+    idx = np.concatenate([np.arange(estadias), idx_map, idx_bebidas])
+    minutos = np.concatenate([minuto_estadia, minuto_map, minuto_bebidas])
+    categoria = np.concatenate([
+        np.full(estadias, 'Estadía', dtype=object),
+        np.full(len(idx_map), 'Map', dtype=object),
+        np.full(len(idx_bebidas), 'Bebidas', dtype=object)
+    ])
+    monto = np.concatenate([montos('Estadía', estadias), montos('Map', len(idx_map)),
+                            montos('Bebidas', len(idx_bebidas))])
+
+    # Ordenar por fecha (orden estable: a igual minuto queda el orden de generación)
+    orden = np.argsort(minutos, kind='stable')
+    minutos_absolutos = int(np.datetime64(inicio, 'm').astype(int)) + minutos[orden]
+    fecha, fecha_orden = _formatear_fechas(minutos_absolutos)
+    idx = idx[orden]
+
+    df = pd.DataFrame({
+        'fecha': fecha,
+        'habitacion': habitaciones[fila_hab][idx],
+        'pasajero': nombres[idx],
+        'categoria': categoria[orden],
+        'monto': monto[orden],
+        'fecha_orden': fecha_orden
+    })
+    return df, estadias
+
+def _destino_csv(ruta):
+    """
+    Escritor por bloques al libro CSV (reemplaza el libro existente). Solo si
+    se reemplaza el libro de la app se descartan sus lápidas y totales: con
+    --salida a otro archivo no se toca nada del libro en uso.
+    """
+    import libro_consumos
+    if os.path.abspath(ruta) == os.path.abspath(libro_consumos.DB_CONSUMOS):
+        for archivo in (libro_consumos.DB_ELIMINADOS, libro_consumos.DB_TOTALES):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+    estado = {'primero': True}
+
+    def escribir(df):
+        df.to_csv(ruta, columns=libro_consumos.COLUMNAS_CONSUMOS, index=False,
+                  mode='w' if estado['primero'] else 'a', header=estado['primero'])
+        estado['primero'] = False
+    return escribir, lambda: None
+
+def _destino_sqlite(ruta):
+    """Escritor por bloques a la base SQLite de la app (reemplaza los consumos existentes)"""
+    from almacenamiento import AlmacenSQLite
+    conexion = AlmacenSQLite(ruta).conexion()
+    conexion.execute('DELETE FROM consumos')
+
+    def escribir(df):
+        conexion.executemany(
+            'INSERT INTO consumos (id, fecha, fecha_orden, habitacion, pasajero, categoria, monto) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            zip(df['id'], df['fecha'], df['fecha_orden'], df['habitacion'].tolist(),
+                df['pasajero'], df['categoria'], df['monto'].astype(float).tolist())
+        )
+    return escribir, conexion.commit
+
+def generar_vectorizado(temporadas, habitaciones, dias_temporada, semilla, destino, ruta, tamanio_bloque):
+    """
+    Genera las temporadas una por una (en orden cronológico, así el archivo
+    queda ordenado sin juntar todo en memoria) y las escribe por bloques.
+    Retorna la cantidad de consumos escritos.
+    """
+    rng = np.random.default_rng(semilla)
+    numeros_hab = habitaciones_sinteticas(habitaciones)
+    escribir, finalizar = _destino_csv(ruta) if destino == 'csv' else _destino_sqlite(ruta)
+
+    # Ids únicos y reproducibles: prefijo de la corrida + contador
+    prefijo = f'{int(rng.integers(0, 16 ** 4)):04x}'
+    total = 0
+    pasajeros = 0
+    for temporada in range(temporadas):
+        inicio = INICIO_TEMPORADAS + timedelta(days=365 * temporada)
+        df, estadias = generar_temporada(rng, numeros_hab, inicio, dias_temporada, pasajeros)
+        pasajeros += estadias
+        df.insert(0, 'id', prefijo + np.char.mod('%08x', np.arange(total, total + len(df))).astype(object))
+
+        for desde in range(0, len(df), tamanio_bloque):
+            escribir(df.iloc[desde:desde + tamanio_bloque])
+        total += len(df)
+        print(f"   ✅ Temporada {temporada + 1}/{temporadas}: {len(df):,} consumos ({estadias:,} estadías)")
+
+    finalizar()
+    return total
+
+def main_vectorizado(args):
+    destino = args.destino or os.environ.get('RECEPCION_ALMACEN', 'csv')
+    ruta = args.salida or (DB_CONSUMOS if destino == 'csv' else 'recepcion.db')
+
+    print("⚡ Generando consumos de prueba (modo vectorizado)...")
+    print("=" * 60)
+    print(f"   Temporadas: {args.temporadas} × {args.dias} días, habitaciones: {args.habitaciones}, semilla: {args.semilla}")
+
+    inicio = time.perf_counter()
+    total = generar_vectorizado(args.temporadas, args.habitaciones, args.dias, args.semilla,
+                                destino, ruta, args.bloque)
+    segundos = time.perf_counter() - inicio
+
+    print("\n" + "=" * 60)
+    print(f"✅ Se generaron {total:,} consumos en {segundos:.2f} s ({total / max(segundos, 1e-9):,.0f} por segundo)")
+    print(f"📁 Destino: {ruta} ({destino})")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera consumos de prueba')
+    parser.add_argument('--vectorizado', action='store_true',
+                        help='Generar temporadas sintéticas con NumPy (pruebas de carga)')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla para resultados reproducibles')
+    parser.add_argument('--temporadas', type=int, default=1, help='Temporadas a generar (modo vectorizado)')
+    parser.add_argument('--habitaciones', type=int, default=53, help='Habitaciones sintéticas (modo vectorizado)')
+    parser.add_argument('--dias', type=int, default=90, help='Días por temporada (modo vectorizado)')
+    parser.add_argument('--destino', choices=['csv', 'sqlite'],
+                        help='Backend de destino (por defecto RECEPCION_ALMACEN o csv)')
+    parser.add_argument('--salida', help='Archivo de destino (por defecto el de la app)')
+    parser.add_argument('--bloque', type=int, default=100000, help='Filas por escritura (modo vectorizado)')
+    args = parser.parse_args()
+
+    if args.vectorizado:
+        main_vectorizado(args)
+        return
+
+    if args.semilla is not None:
+        random.seed(args.semilla)
+
+    # Leer pasajeros activos
+    df_pasajeros = pd.read_csv(DB_PASAJEROS)
+    df_consumos = generar_consumos(df_pasajeros)
+
+    # Guardar en CSV
+    df_consumos.to_csv(DB_CONSUMOS, index=False)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Se generaron {len(df_consumos)} consumos para {len(df_pasajeros)} habitaciones")
+    print(f"📁 Archivo guardado: {DB_CONSUMOS}")
+    print("\n📊 Resumen por categoría:")
+    resumen = df_consumos.groupby('categoria')['monto'].agg(['count', 'sum'])
+    for categoria, datos in resumen.iterrows():
+        print(f"   • {categoria}: {int(datos['count'])} consumos - Total: ${datos['sum']:,.0f}")
+
+    print(f"\n💰 Total general: ${df_consumos['monto'].sum():,.0f}")
+    print("=" * 60)
+    print("\n🎯 Ahora puedes probar las funciones de cierre y exportación!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histórico de pasajeros a partir de GRILLA_DE_PAX_RESPALDO_HISTORICO.ods.
+La conversión (una sola vez, o cuando cambia el ODS) recorre el XML de la
+planilla en streaming, reconoce en cada hoja las filas de estadías (por los
+encabezados HAB / IN / OUT / N.º / NOMBRE, o con el orden del export del PMS
+si la hoja no tiene encabezado) y las guarda en historico.db (SQLite) con
+índices por documento, habitación y fechas. Las consultas después no vuelven
+a abrir el ODS.
+
+Al histórico se suman las hojas Ingresos de la grilla de trabajo: las de
+cada versión guardada en el almacén de respaldos (incorporar --respaldos) y
+la de la temporada que se limpia (limpiar_grillas_pisos.py). procesar_reservas.py
+consulta el índice por documento para marcar a los pasajeros que regresan.
+
+No necesita odfpy: el ODS es un ZIP con content.xml y se lee con la
+biblioteca estándar (pandas + odfpy expande las filas y columnas vacías
+repetidas y no puede con este archivo).
+
+Uso:
+    python historico.py convertir [archivo.ods] [--forzar]
+    python historico.py incorporar [grilla.xlsx ...] [--respaldos]
+    python historico.py documento 18257880
+    python historico.py habitacion 222 [--desde 2023-01-01] [--hasta 2023-12-31]
+    python historico.py nombre GOMEZ
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime
+
+import openpyxl
+
+import respaldos
+
+ODS_HISTORICO = 'GRILLA_DE_PAX_RESPALDO_HISTORICO.ods'
+DB_HISTORICO = 'historico.db'
+
+# Espacios de nombres del XML de OpenDocument
+_TABLE = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+_TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+_OFFICE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+
+# Encabezados reconocidos para cada campo (normalizados: mayúsculas, sin
+# tildes ni punto final; 'N.º' queda 'N.O')
+ENCABEZADOS = {
+    'habitacion': {'HAB', 'NRO. HAB', 'NRO. HABITACION'},
+    'fecha_ingreso': {'IN', 'FECHA DE INGRESO'},
+    'fecha_egreso': {'OUT', 'FECHA DE EGRESO'},
+    'nro_doc': {'N.O', 'NRO. DOC', 'NUMERO'},
+    'nombre': {'NOMBRE', 'APELLIDO Y NOMBRE', 'NOMBRE Y APELLIDO'},
+    'edad': {'EDAD'},
+    'voucher': {'VOUCHER'},
+    'servicios': {'MAP', 'SERVICIOS', 'COMIDA', 'REGIMEN'},
+}
+
+# En las grillas de piso 'DNI' es el tipo de documento (el número va en
+# NUMERO); en algunos rooming es la única columna del documento
+ENCABEZADO_DNI = 'DNI'
+
+# Filas con fecha y "nombre" que no son pasajeros
+NOMBRES_NO_PAX = {'BLOQUEO', 'BLOQUEOS', 'RESERVA'}
+
+# Habitación válida: '101', '101 A', '104x223'; el resto ('80cm', notas) hereda la anterior
+PATRON_HABITACION = re.compile(r'^(\d+)\s*(?:[xX/-]\s*\d+)?\s*[A-Za-z]?$')
+
+# Orden de columnas del export del PMS, para las hojas sin encabezado
+COLUMNAS_SIN_ENCABEZADO = {
+    'habitacion': 0, 'fecha_ingreso': 1, 'fecha_egreso': 2, 'nro_doc': 5,
+    'nombre': 6, 'edad': 7, 'voucher': 8, 'servicios': 9
+}
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y')
+
+# Grilla de trabajo cuya hoja Ingresos se incorpora al histórico
+# (DEBEN COINCIDIR con procesar_reservas.py)
+GRILLA_PAX = "Grilla de Pax 2030.xlsx"
+HOJA_INGRESOS = 'Ingresos 23 D MAYO'
+ULTIMA_COLUMNA_INGRESOS = 14  # A (HAB) a N (OBSERVACIONES)
+
+# Documentos más cortos son relleno ('0', '4545', '27') y no identifican a nadie
+MINIMO_DIGITOS_DOCUMENTO = 6
+
+ESQUEMA_HISTORICO = """
+CREATE TABLE IF NOT EXISTS estadias (
+    hoja TEXT NOT NULL,
+    fila INTEGER NOT NULL,
+    habitacion TEXT,
+    habitacion_num INTEGER,
+    fecha_ingreso TEXT NOT NULL,
+    fecha_egreso TEXT,
+    nro_doc TEXT,
+    nombre TEXT,
+    edad TEXT,
+    voucher TEXT,
+    servicios TEXT,
+    origen TEXT NOT NULL DEFAULT 'ods'
+);
+CREATE INDEX IF NOT EXISTS idx_estadias_doc ON estadias (nro_doc, fecha_ingreso);
+CREATE INDEX IF NOT EXISTS idx_estadias_habitacion ON estadias (habitacion_num, fecha_ingreso);
+CREATE INDEX IF NOT EXISTS idx_estadias_ingreso ON estadias (fecha_ingreso);
+CREATE INDEX IF NOT EXISTS idx_estadias_egreso ON estadias (fecha_egreso);
+
+CREATE TABLE IF NOT EXISTS fuentes (
+    hash TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    incorporado TEXT NOT NULL
+);
+"""
+
+def _valor_celda(celda):
+    """Valor de una celda del XML: número o fecha sin formato, o el texto visible"""
+    valor = celda.get(_OFFICE + 'date-value') or celda.get(_OFFICE + 'value')
+    if valor is not None:
+        return valor
+    parrafos = [''.join(p.itertext()) for p in celda.iter(_TEXT + 'p')]
+    return '\n'.join(parrafos).strip() or None
+
+def leer_filas_ods(ruta):
+    """
+    Generador: (hoja, número de fila, [valores]) de cada fila con contenido,
+    leyendo content.xml en streaming. Las filas y celdas repetidas del
+    formato se expanden, salvo los tramos vacíos del final.
+    """
+    with zipfile.ZipFile(ruta) as ods, ods.open('content.xml') as contenido:
+        hoja = None
+        numero_fila = 0
+        for evento, elemento in ET.iterparse(contenido, events=('start', 'end')):
+            if evento == 'start':
+                if elemento.tag == _TABLE + 'table':
+                    hoja = elemento.get(_TABLE + 'name')
+                    numero_fila = 0
+                continue
+
+            if elemento.tag == _TABLE + 'table-row':
+                valores = []
+                for celda in elemento:
+                    if celda.tag not in (_TABLE + 'table-cell', _TABLE + 'covered-table-cell'):
+                        continue
+                    repeticiones = int(celda.get(_TABLE + 'number-columns-repeated', '1'))
+                    valor = _valor_celda(celda)
+                    # Los tramos vacíos largos son relleno hasta el final de la hoja
+                    valores.extend([valor] * (repeticiones if valor is not None or repeticiones < 100 else 1))
+                while valores and valores[-1] is None:
+                    valores.pop()
+
+                repeticiones = int(elemento.get(_TABLE + 'number-rows-repeated', '1'))
+                for _ in range(repeticiones if valores else 0):
+                    numero_fila += 1
+                    yield hoja, numero_fila, valores
+                if not valores:
+                    numero_fila += repeticiones
+                elemento.clear()
+            elif elemento.tag == _TABLE + 'table':
+                elemento.clear()
+
+def fecha_iso(valor):
+    """Convierte las fechas de la planilla (ISO, dd/mm/aaaa, dd-mm-aaaa) a 'aaaa-mm-dd', o None"""
+    if not valor:
+        return None
+    texto = str(valor).strip()[:10]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+def normalizar_documento(valor):
+    """Solo los dígitos del número de documento ('' si no tiene)"""
+    if valor is None:
+        return ''
+    texto = re.sub(r'\.0+$', '', str(valor).strip())
+    return re.sub(r'\D', '', texto)
+
+def _etiqueta(valor):
+    """Texto de encabezado normalizado para comparar con ENCABEZADOS"""
+    texto = str(valor or '').strip()
+    try:
+        # Algunos encabezados pegados desde el PMS vienen con doble codificación ('habitaciÃ³n')
+        texto = texto.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        pass
+    texto = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return texto.upper().rstrip('.')
+
+def _columnas_encabezado(valores):
+    """{campo: índice} si la fila es un encabezado reconocible, si no None"""
+    columnas = {}
+    columna_dni = None
+    for indice, valor in enumerate(valores):
+        etiqueta = _etiqueta(valor)
+        if etiqueta == ENCABEZADO_DNI and columna_dni is None:
+            columna_dni = indice
+        for campo, etiquetas in ENCABEZADOS.items():
+            if etiqueta in etiquetas and campo not in columnas:
+                columnas[campo] = indice
+    if 'nro_doc' not in columnas and columna_dni is not None:
+        columnas['nro_doc'] = columna_dni
+    if 'fecha_ingreso' in columnas and 'fecha_egreso' in columnas and len(columnas) >= 3:
+        return columnas
+    return None
+
+def filas_hoja(ws, max_col=None):
+    """
+    Generador: (hoja, número de fila, [valores]) de una hoja de openpyxl, como
+    leer_filas_ods. Conviene limitar max_col: las hojas con formato hasta la
+    columna AMJ harían recorrer (y crear) miles de celdas vacías por fila.
+    """
+    for numero_fila, valores in enumerate(ws.iter_rows(max_col=max_col, values_only=True), start=1):
+        valores = list(valores)
+        while valores and valores[-1] is None:
+            valores.pop()
+        if valores:
+            yield ws.title, numero_fila, valores
+
+def extraer_estadias(filas):
+    """
+    Generador de estadías (dicts con las columnas de la tabla estadias) a
+    partir de las filas de leer_filas_ods() o filas_hoja().
+    Una fila es una estadía si tiene fecha de ingreso válida y nombre o
+    documento. Las filas sin habitación heredan la del pax anterior.
+    """
+    hoja_actual = None
+    for hoja, numero_fila, valores in filas:
+        if hoja != hoja_actual:
+            hoja_actual = hoja
+            columnas = COLUMNAS_SIN_ENCABEZADO
+            habitacion_anterior = None
+
+        encabezado = _columnas_encabezado(valores)
+        if encabezado:
+            columnas = encabezado
+            habitacion_anterior = None
+            continue
+
+        def campo(nombre):
+            indice = columnas.get(nombre)
+            if indice is None or indice >= len(valores) or valores[indice] is None:
+                return None
+            return str(valores[indice]).strip() or None
+
+        ingreso = fecha_iso(campo('fecha_ingreso'))
+        nombre = campo('nombre')
+        documento = normalizar_documento(campo('nro_doc'))
+        if ingreso is None or not (nombre or documento) or (nombre or '').upper() in NOMBRES_NO_PAX:
+            continue
+
+        habitacion = campo('habitacion')
+        if habitacion is None or not PATRON_HABITACION.match(habitacion):
+            habitacion = habitacion_anterior
+        habitacion_anterior = habitacion
+        numero = PATRON_HABITACION.match(habitacion or '')
+
+        yield {
+            'hoja': hoja,
+            'fila': numero_fila,
+            'habitacion': habitacion,
+            'habitacion_num': int(numero.group(1)) if numero else None,
+            'fecha_ingreso': ingreso,
+            'fecha_egreso': fecha_iso(campo('fecha_egreso')),
+            'nro_doc': documento,
+            'nombre': nombre,
+            'edad': campo('edad'),
+            'voucher': campo('voucher'),
+            'servicios': campo('servicios'),
+            'origen': 'ods',
+        }
+
+@contextmanager
+def conectar(ruta_db=DB_HISTORICO):
+    """
+    Conexión a la base del histórico para un bloque with: confirma la
+    transacción al salir (o la revierte si hubo un error) y cierra la conexión
+    (with sqlite3.connect(...) solo maneja la transacción, no la cierra).
+    """
+    conexion = sqlite3.connect(ruta_db)
+    try:
+        conexion.row_factory = sqlite3.Row
+        conexion.executescript(ESQUEMA_HISTORICO)
+        columnas = {fila['name'] for fila in conexion.execute('PRAGMA table_info(estadias)')}
+        if 'origen' not in columnas:  # Bases convertidas antes de incorporar las grillas
+            conexion.execute("ALTER TABLE estadias ADD COLUMN origen TEXT NOT NULL DEFAULT 'ods'")
+        with conexion:
+            yield conexion
+    finally:
+        conexion.close()
+
+def _registrar_fuente(conexion, hash_fuente, archivo, tipo):
+    conexion.execute('INSERT OR REPLACE INTO fuentes (hash, archivo, tipo, incorporado) VALUES (?, ?, ?, ?)',
+                     (hash_fuente, archivo, tipo, datetime.now().isoformat(timespec='seconds')))
+
+def convertir(ruta_ods=ODS_HISTORICO, ruta_db=DB_HISTORICO, forzar=False):
+    """
+    Carga las estadías del ODS en la base (reemplaza las del ODS anterior;
+    las incorporadas de la grilla se conservan). Si el ODS no cambió desde la
+    última conversión no hace nada, salvo forzar=True.
+    Retorna {hoja: estadías} o None si ya estaba al día.
+    """
+    hash_ods = respaldos.hash_archivo(ruta_ods)
+    with conectar(ruta_db) as conexion:
+        anterior = conexion.execute("SELECT hash FROM fuentes WHERE tipo = 'ods'").fetchone()
+        if anterior and anterior['hash'] == hash_ods and not forzar:
+            return None
+
+        conexion.execute("DELETE FROM estadias WHERE origen = 'ods'")
+        conexion.execute("DELETE FROM fuentes WHERE tipo = 'ods'")
+        por_hoja = {}
+        lote = []
+        for estadia in extraer_estadias(leer_filas_ods(ruta_ods)):
+            por_hoja[estadia['hoja']] = por_hoja.get(estadia['hoja'], 0) + 1
+            lote.append(estadia)
+            if len(lote) >= 5000:
+                _insertar(conexion, lote)
+                lote = []
+        _insertar(conexion, lote)
+        _registrar_fuente(conexion, hash_ods, ruta_ods, 'ods')
+    return por_hoja
+
+def _clave_estadia(estadia):
+    return tuple(estadia[campo] for campo in ('nro_doc', 'habitacion', 'fecha_ingreso', 'fecha_egreso', 'nombre'))
+
+def incorporar_filas(filas, ruta_db=DB_HISTORICO, conexion=None):
+    """
+    Agrega al histórico las estadías de una hoja Ingresos de la grilla
+    (filas como las de filas_hoja). Las que ya estaban, por haberse
+    incorporado de otra versión de la grilla, no se repiten.
+    Retorna la cantidad de estadías nuevas.
+    """
+    if conexion is None:
+        with conectar(ruta_db) as conexion:
+            return incorporar_filas(filas, conexion=conexion)
+
+    existentes = {
+        _clave_estadia(fila) for fila in conexion.execute(
+            "SELECT nro_doc, habitacion, fecha_ingreso, fecha_egreso, nombre FROM estadias WHERE origen = 'grilla'")
+    }
+    nuevas = []
+    for estadia in extraer_estadias(filas):
+        clave = _clave_estadia(estadia)
+        if clave not in existentes:
+            existentes.add(clave)
+            nuevas.append(dict(estadia, origen='grilla'))
+    _insertar(conexion, nuevas)
+    return len(nuevas)
+
+def incorporar_grilla(ruta_xlsx, ruta_db=DB_HISTORICO, conexion=None, hash_grilla=None, nombre=None):
+    """
+    Incorpora la hoja Ingresos de una grilla XLSX. Cada versión (por hash) se
+    lee una sola vez. Retorna las estadías nuevas, o None si ya se había incorporado.
+    """
+    if conexion is None:
+        with conectar(ruta_db) as conexion:
+            return incorporar_grilla(ruta_xlsx, conexion=conexion, hash_grilla=hash_grilla, nombre=nombre)
+
+    hash_grilla = hash_grilla or respaldos.hash_archivo(ruta_xlsx)
+    if conexion.execute('SELECT 1 FROM fuentes WHERE hash = ?', (hash_grilla,)).fetchone():
+        return None
+
+    wb = openpyxl.load_workbook(ruta_xlsx, read_only=True)
+    try:
+        nuevas = 0
+        if HOJA_INGRESOS in wb.sheetnames:
+            nuevas = incorporar_filas(filas_hoja(wb[HOJA_INGRESOS], ULTIMA_COLUMNA_INGRESOS), conexion=conexion)
+    finally:
+        wb.close()
+    _registrar_fuente(conexion, hash_grilla, nombre or ruta_xlsx, 'grilla')
+    return nuevas
+
+def incorporar_respaldos(nombre=GRILLA_PAX, ruta_db=DB_HISTORICO):
+    """
+    Incorpora la hoja Ingresos de cada versión de la grilla guardada en el
+    almacén de respaldos que todavía no se haya leído.
+    Retorna (versiones leídas, estadías nuevas).
+    """
+    versiones = 0
+    nuevas = 0
+    with conectar(ruta_db) as conexion, tempfile.TemporaryDirectory(prefix='historico_') as directorio:
+        for entrada in respaldos.listar(nombre):
+            if conexion.execute('SELECT 1 FROM fuentes WHERE hash = ?', (entrada['hash'],)).fetchone():
+                continue
+            ruta = respaldos.restaurar(entrada['hash'], os.path.join(directorio, 'grilla.xlsx'))
+            nuevas += incorporar_grilla(ruta, conexion=conexion, hash_grilla=entrada['hash'],
+                                        nombre=f"{nombre} ({entrada['fecha']})") or 0
+            versiones += 1
+    return versiones, nuevas
+
+def indice_documentos(ruta_db=DB_HISTORICO):
+    """
+    {documento: [fechas de ingreso ordenadas]} de todo el histórico, para
+    consultar en memoria (un acceso al dict por reserva) durante la importación.
+    Si la base no existe retorna un dict vacío.
+    """
+    if not os.path.exists(ruta_db):
+        return {}
+    indice = {}
+    with conectar(ruta_db) as conexion:
+        for nro_doc, ingreso in conexion.execute(
+                'SELECT nro_doc, fecha_ingreso FROM estadias WHERE length(nro_doc) >= ? '
+                'ORDER BY nro_doc, fecha_ingreso', (MINIMO_DIGITOS_DOCUMENTO,)):
+            indice.setdefault(nro_doc, []).append(ingreso)
+    return indice
+
+def estadias_previas(indice, nro_doc, fecha_ingreso):
+    """
+    (cantidad, fecha de la última) de las estadías del documento anteriores a
+    fecha_ingreso (cualquier formato de la planilla) según indice_documentos().
+    """
+    fechas = indice.get(normalizar_documento(nro_doc))
+    if not fechas:
+        return 0, None
+    ingreso = fecha_iso(fecha_ingreso)
+    cantidad = bisect.bisect_left(fechas, ingreso) if ingreso else len(fechas)
+    return cantidad, fechas[cantidad - 1] if cantidad else None
+
+def _insertar(conexion, estadias):
+    conexion.executemany(
+        'INSERT INTO estadias (hoja, fila, habitacion, habitacion_num, fecha_ingreso, fecha_egreso, '
+        'nro_doc, nombre, edad, voucher, servicios, origen) VALUES (:hoja, :fila, :habitacion, :habitacion_num, '
+        ':fecha_ingreso, :fecha_egreso, :nro_doc, :nombre, :edad, :voucher, :servicios, :origen)',
+        estadias
+    )
+
+def buscar_documento(nro_doc, ruta_db=DB_HISTORICO):
+    """Estadías de un documento, de la más reciente a la más antigua"""
+    with conectar(ruta_db) as conexion:
+        return [dict(fila) for fila in conexion.execute(
+            'SELECT * FROM estadias WHERE nro_doc = ? ORDER BY fecha_ingreso DESC',
+            (normalizar_documento(nro_doc),)
+        )]
+
+def ultima_estadia(nro_doc, ruta_db=DB_HISTORICO):
+    """Última estadía del documento, o None"""
+    estadias = buscar_documento(nro_doc, ruta_db)
+    return estadias[0] if estadias else None
+
+def buscar_habitacion(habitacion, desde=None, hasta=None, ruta_db=DB_HISTORICO):
+    """Estadías en la habitación con ingreso entre desde y hasta ('aaaa-mm-dd', opcionales)"""
+    condiciones = ['habitacion_num = ?']
+    parametros = [int(habitacion)]
+    if desde:
+        condiciones.append('fecha_ingreso >= ?')
+        parametros.append(desde)
+    if hasta:
+        condiciones.append('fecha_ingreso <= ?')
+        parametros.append(hasta)
+    with conectar(ruta_db) as conexion:
+        return [dict(fila) for fila in conexion.execute(
+            f"SELECT * FROM estadias WHERE {' AND '.join(condiciones)} ORDER BY fecha_ingreso DESC",
+            parametros
+        )]
+
+def buscar_nombre(texto, ruta_db=DB_HISTORICO):
+    """Estadías cuyo nombre contiene el texto (sin distinguir mayúsculas)"""
+    with conectar(ruta_db) as conexion:
+        return [dict(fila) for fila in conexion.execute(
+            'SELECT * FROM estadias WHERE nombre LIKE ? ORDER BY fecha_ingreso DESC',
+            (f'%{texto}%',)
+        )]
+
+def _mostrar(estadias):
+    if not estadias:
+        print("📭 Sin resultados.")
+        return
+    for e in estadias:
+        print(f"   {e['fecha_ingreso']} → {e['fecha_egreso'] or '?':10}  HAB {e['habitacion'] or '-':8}"
+              f"  {e['nro_doc'] or '-':>10}  {e['nombre'] or '-'}  ({e['hoja']}, fila {e['fila']})")
+    print(f"\n   Total: {len(estadias)} estadía(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Histórico de pasajeros (ODS convertido a SQLite)')
+    parser.add_argument('--db', default=DB_HISTORICO, help=f'Base del histórico (default: {DB_HISTORICO})')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_convertir = subcomandos.add_parser('convertir', help='Convertir el ODS a la base del histórico')
+    p_convertir.add_argument('ods', nargs='?', default=ODS_HISTORICO)
+    p_convertir.add_argument('--forzar', action='store_true', help='Convertir aunque el ODS no haya cambiado')
+
+    p_incorporar = subcomandos.add_parser('incorporar', help='Sumar al histórico la hoja Ingresos de grillas XLSX')
+    p_incorporar.add_argument('grillas', nargs='*', help='Grillas XLSX a incorporar')
+    p_incorporar.add_argument('--respaldos', action='store_true',
+                              help=f'Incorporar todas las versiones de {GRILLA_PAX} del almacén de respaldos')
+
+    p_documento = subcomandos.add_parser('documento', help='Estadías de un número de documento')
+    p_documento.add_argument('nro_doc')
+
+    p_habitacion = subcomandos.add_parser('habitacion', help='Estadías de una habitación')
+    p_habitacion.add_argument('habitacion', type=int)
+    p_habitacion.add_argument('--desde', help='Ingreso desde (aaaa-mm-dd)')
+    p_habitacion.add_argument('--hasta', help='Ingreso hasta (aaaa-mm-dd)')
+
+    p_nombre = subcomandos.add_parser('nombre', help='Estadías por nombre (búsqueda parcial)')
+    p_nombre.add_argument('texto')
+
+    args = parser.parse_args()
+
+    if args.comando == 'convertir':
+        print(f"📂 Convirtiendo {args.ods} → {args.db}...")
+        try:
+            por_hoja = convertir(args.ods, args.db, args.forzar)
+        except (OSError, zipfile.BadZipFile, ET.ParseError) as e:
+            print(f"❌ ERROR al leer el ODS: {e}")
+            sys.exit(1)
+        if por_hoja is None:
+            print("✅ El histórico ya está al día (el ODS no cambió). Usar --forzar para reconvertir.")
+            return
+        for hoja, cantidad in por_hoja.items():
+            print(f"   • {hoja}: {cantidad} estadías")
+        print(f"✅ Histórico convertido: {sum(por_hoja.values())} estadías")
+    elif args.comando == 'incorporar':
+        if not args.grillas and not args.respaldos:
+            parser.error('indicar grillas XLSX o --respaldos')
+        try:
+            for grilla in args.grillas:
+                nuevas = incorporar_grilla(grilla, args.db)
+                if nuevas is None:
+                    print(f"   • {grilla}: ya incorporada")
+                else:
+                    print(f"   • {grilla}: {nuevas} estadías nuevas")
+            if args.respaldos:
+                versiones, nuevas = incorporar_respaldos(ruta_db=args.db)
+                print(f"   • Almacén de respaldos: {versiones} versión(es) leídas, {nuevas} estadías nuevas")
+        except (OSError, ValueError, RuntimeError, zipfile.BadZipFile) as e:
+            print(f"❌ ERROR al incorporar: {e}")
+            sys.exit(1)
+        print("✅ Histórico actualizado")
+    elif args.comando == 'documento':
+        _mostrar(buscar_documento(args.nro_doc, args.db))
+    elif args.comando == 'habitacion':
+        _mostrar(buscar_habitacion(args.habitacion, args.desde, args.hasta, args.db))
+    elif args.comando == 'nombre':
+        _mostrar(buscar_nombre(args.texto, args.db))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Libro de consumos (consumos_diarios.csv) con totales acumulados por habitación.
+Los totales habitación × categoría se actualizan al registrar o eliminar cada
+consumo y se guardan en consumos_totales.json, así los cierres no necesitan
+recorrer todo el libro de la temporada.
+
+Cada consumo tiene un id estable. Eliminar un consumo no reescribe el libro:
+se anota su id en consumos_eliminados.csv (lápida) y todos los lectores lo
+ignoran. El libro se compacta (reescribe sin los eliminados) recién cuando
+las lápidas superan UMBRAL_COMPACTACION, o a mano con:
+
+    python libro_consumos.py compactar
+
+Todas las escrituras toman un bloqueo de archivo (fcntl) además del lock del
+proceso, así la app puede correr con varios workers de gunicorn sin
+entreverar filas. Opcionalmente los consumos se acumulan en memoria y se
+escriben por lotes (ver activar_escritura_por_lotes).
+"""
+
+import atexit
+import csv
+import json
+import os
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+import metricas
+import respaldos
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo queda el lock entre hilos del proceso
+    fcntl = None
+
+# Archivos de datos
+DB_CONSUMOS = 'consumos_diarios.csv'
+DB_TOTALES = 'consumos_totales.json'
+DB_ELIMINADOS = 'consumos_eliminados.csv'
+DB_BLOQUEO = 'consumos_diarios.lock'
+
+COLUMNAS_CONSUMOS = ['id', 'fecha', 'habitacion', 'pasajero', 'categoria', 'monto']
+FORMATO_FECHA = '%d/%m/%Y %H:%M'
+
+# Filas leídas por bloque al recorrer el libro para paginar
+TAMANIO_BLOQUE = 10000
+
+# Cantidad de consumos eliminados a partir de la cual se reescribe el libro
+UMBRAL_COMPACTACION = 50
+
+# Totales en memoria: {(habitacion, pasajero): {'cantidad': n, 'totales': {categoria: monto}}}
+_estado = {'firma': None, 'totales': {}}
+_lock = threading.RLock()
+
+# Índice de filas del libro por habitación, para los folios: {habitacion: [offsets en bytes]}
+# 'inodo' y 'tamanio' indican hasta dónde está indexado el archivo. El libro solo
+# crece por el final; cuando se reescribe (compactar, reiniciar) cambia de inodo
+_indice_filas = {'inodo': None, 'tamanio': 0, 'filas': {}}
+
+# Bloqueo entre procesos: nivel de anidamiento y archivo de lock abierto
+_bloqueo_estado = {'nivel': 0, 'archivo': None}
+
+# Escritor por lotes activo (None = cada consumo se escribe al registrarlo)
+_escritor = None
+
+@contextmanager
+def _bloqueo():
+    """
+    Exclusión mutua sobre el libro entre hilos (RLock) y entre procesos
+    (flock sobre DB_BLOQUEO). Es reentrante dentro del mismo hilo.
+    """
+    with _lock:
+        if _bloqueo_estado['nivel'] == 0 and fcntl is not None:
+            archivo = open(DB_BLOQUEO, 'a')
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            _bloqueo_estado['archivo'] = archivo
+        _bloqueo_estado['nivel'] += 1
+        try:
+            yield
+        finally:
+            _bloqueo_estado['nivel'] -= 1
+            if _bloqueo_estado['nivel'] == 0 and _bloqueo_estado['archivo'] is not None:
+                fcntl.flock(_bloqueo_estado['archivo'], fcntl.LOCK_UN)
+                _bloqueo_estado['archivo'].close()
+                _bloqueo_estado['archivo'] = None
+
+def _firma_archivo(ruta):
+    """Retorna (mtime, tamaño) del archivo, o None si no existe"""
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _firma_libro():
+    """Firma del estado del libro: el CSV de consumos más sus lápidas"""
+    firma = _firma_archivo(DB_CONSUMOS)
+    if firma is None:
+        return None
+    return firma + (_firma_archivo(DB_ELIMINADOS) or [0, 0])
+
+def version():
+    """
+    Versión del libro: cambia con cada consumo registrado o eliminado, al
+    compactar y al reiniciar (firma del CSV y de las lápidas, válida entre
+    procesos). Los consumos encolados se escriben antes de calcularla.
+    """
+    with _bloqueo():
+        _vaciar_pendientes()
+        return tuple(_firma_libro() or ())
+
+def nuevo_id():
+    """Genera el id estable de un consumo"""
+    return uuid.uuid4().hex[:12]
+
+def _escribir_atomico(ruta, contenido):
+    """Escribe a un temporal y lo renombra, para no dejar archivos a medias"""
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+def _sumar(totales, habitacion, pasajero, categoria, monto, signo=1):
+    """Suma (o resta) un consumo en el acumulado de su habitación"""
+    clave = (int(habitacion), str(pasajero))
+    entrada = totales.setdefault(clave, {'cantidad': 0, 'totales': {}})
+    entrada['cantidad'] += signo
+    acumulado = entrada['totales'].get(categoria, 0.0) + signo * float(monto)
+    entrada['totales'][categoria] = round(acumulado, 2)
+
+    # Una habitación sin consumos vigentes desaparece del cierre (igual que en el pivot)
+    if entrada['cantidad'] <= 0:
+        del totales[clave]
+
+def _asegurar_ids():
+    """
+    Migra un libro de versiones anteriores (sin columna id) asignando un id a
+    cada consumo. Se hace una única vez: después el encabezado ya trae el id.
+    """
+    if not os.path.exists(DB_CONSUMOS):
+        return
+
+    with open(DB_CONSUMOS, 'r', newline='', encoding='utf-8') as f:
+        encabezado = next(csv.reader(f), [])
+    if not encabezado or encabezado[0] == 'id':
+        return
+
+    df = pd.read_csv(DB_CONSUMOS)
+    df.insert(0, 'id', [nuevo_id() for _ in range(len(df))])
+    _escribir_atomico(DB_CONSUMOS, df.to_csv(index=False))
+
+    # Las lápidas anteriores no tienen sentido con ids nuevos
+    if os.path.exists(DB_ELIMINADOS):
+        os.remove(DB_ELIMINADOS)
+
+def _leer_eliminados():
+    """Retorna el conjunto de ids eliminados (lápidas)"""
+    if not os.path.exists(DB_ELIMINADOS):
+        return set()
+    with open(DB_ELIMINADOS, 'r', newline='', encoding='utf-8') as f:
+        return {fila[0] for fila in csv.reader(f) if fila}
+
+def leer_consumos():
+    """
+    Lee el libro completo sin los consumos eliminados.
+    Retorna un DataFrame vacío (con columnas) si todavía no hay libro.
+    """
+    with _bloqueo():
+        _vaciar_pendientes()
+        _asegurar_ids()
+        if not os.path.exists(DB_CONSUMOS):
+            return pd.DataFrame(columns=COLUMNAS_CONSUMOS)
+        df = pd.read_csv(DB_CONSUMOS, dtype={'id': str})
+        eliminados = _leer_eliminados()
+    metricas.contar('recepcion_libro_filas_leidas_total', len(df), almacen='csv')
+
+    if eliminados:
+        df = df[~df['id'].isin(eliminados)].reset_index(drop=True)
+    return df
+
+def filtrar_consumos(df, filtros):
+    """
+    Aplica los filtros del historial a un bloque del libro.
+    filtros: habitacion (int), categoria (str), desde / hasta (date, inclusive).
+    """
+    mascara = pd.Series(True, index=df.index)
+    if filtros.get('habitacion') is not None:
+        mascara &= df['habitacion'] == int(filtros['habitacion'])
+    if filtros.get('categoria'):
+        mascara &= df['categoria'] == filtros['categoria']
+    if filtros.get('desde') or filtros.get('hasta'):
+        fechas = pd.to_datetime(df['fecha'], format=FORMATO_FECHA, errors='coerce')
+        if filtros.get('desde'):
+            mascara &= fechas >= pd.Timestamp(filtros['desde'])
+        if filtros.get('hasta'):
+            mascara &= fechas < pd.Timestamp(filtros['hasta']) + pd.Timedelta(days=1)
+    return df[mascara]
+
+def pagina_consumos(filtros, desde, cantidad):
+    """
+    Retorna (total, filas) del historial filtrado: el total de consumos que
+    cumplen los filtros y solo las filas [desde, desde + cantidad) como
+    diccionarios. El libro se recorre por bloques, así la memoria no crece
+    con el tamaño de la temporada.
+    """
+    with _bloqueo():
+        _vaciar_pendientes()
+        _asegurar_ids()
+        if not os.path.exists(DB_CONSUMOS):
+            return 0, []
+        eliminados = _leer_eliminados()
+
+    total = 0
+    filas = []
+    for bloque in pd.read_csv(DB_CONSUMOS, dtype={'id': str}, chunksize=TAMANIO_BLOQUE):
+        metricas.contar('recepcion_libro_filas_leidas_total', len(bloque), almacen='csv')
+        if eliminados:
+            bloque = bloque[~bloque['id'].isin(eliminados)]
+        bloque = filtrar_consumos(bloque, filtros)
+
+        inicio = max(desde - total, 0)
+        fin = desde + cantidad - total
+        if fin > 0 and inicio < len(bloque):
+            filas.extend(bloque.iloc[inicio:fin].to_dict('records'))
+        total += len(bloque)
+    return total, filas
+
+def _recalcular_desde_libro():
+    """Reconstruye los totales leyendo el libro completo (solo si están desactualizados)"""
+    totales = {}
+    if not os.path.exists(DB_CONSUMOS):
+        return totales
+
+    df = leer_consumos()
+    if df.empty:
+        return totales
+
+    agrupado = df.groupby(['habitacion', 'pasajero', 'categoria'])['monto'].agg(['count', 'sum'])
+    for (habitacion, pasajero, categoria), fila in agrupado.iterrows():
+        clave = (int(habitacion), str(pasajero))
+        entrada = totales.setdefault(clave, {'cantidad': 0, 'totales': {}})
+        entrada['cantidad'] += int(fila['count'])
+        entrada['totales'][categoria] = round(float(fila['sum']), 2)
+    return totales
+
+def _guardar_totales():
+    """Persiste los totales junto con la firma del libro al que corresponden"""
+    _estado['firma'] = _firma_libro()
+    datos = {
+        'firma': _estado['firma'],
+        'habitaciones': [
+            {'habitacion': habitacion, 'pasajero': pasajero, **entrada}
+            for (habitacion, pasajero), entrada in _estado['totales'].items()
+        ]
+    }
+    _escribir_atomico(DB_TOTALES, json.dumps(datos, ensure_ascii=False))
+
+def _cargar_totales():
+    """
+    Deja en memoria los totales vigentes del libro. Usa el archivo persistido
+    si corresponde al libro actual; si no (libro editado a mano, regenerado,
+    etc.) los recalcula una única vez.
+    """
+    _asegurar_ids()
+    firma = _firma_libro()
+    if firma is not None and firma == _estado['firma']:
+        return
+
+    if firma is not None and os.path.exists(DB_TOTALES):
+        try:
+            with open(DB_TOTALES, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('firma') == firma:
+                _estado['totales'] = {
+                    (entrada['habitacion'], entrada['pasajero']): {
+                        'cantidad': entrada['cantidad'],
+                        'totales': entrada['totales']
+                    }
+                    for entrada in datos['habitaciones']
+                }
+                _estado['firma'] = firma
+                return
+        except (ValueError, KeyError):
+            pass  # Archivo de totales dañado: se recalcula
+
+    _estado['totales'] = _recalcular_desde_libro()
+    _guardar_totales()
+
+def _escribir_lote(registros, fsync=False):
+    """
+    Agrega los registros al final del libro en una sola escritura bajo
+    bloqueo, y los suma a los totales. Con fsync=True fuerza el volcado a disco.
+    """
+    with _bloqueo():
+        _cargar_totales()
+
+        nuevo = not os.path.exists(DB_CONSUMOS) or os.path.getsize(DB_CONSUMOS) == 0
+        with open(DB_CONSUMOS, 'a', newline='', encoding='utf-8') as f:
+            # Mismo fin de línea que el encabezado y las filas que escribe pandas
+            escritor = csv.writer(f, lineterminator='\n')
+            if nuevo:
+                escritor.writerow(COLUMNAS_CONSUMOS)
+            escritor.writerows([registro[col] for col in COLUMNAS_CONSUMOS] for registro in registros)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        metricas.contar('recepcion_libro_filas_escritas_total', len(registros), almacen='csv')
+
+        for registro in registros:
+            _sumar(_estado['totales'], registro['habitacion'], registro['pasajero'],
+                   registro['categoria'], registro['monto'])
+        _guardar_totales()
+
+        # Si ya se pidió algún folio, el índice se extiende con las filas recién escritas
+        if _indice_filas['inodo'] is not None:
+            _actualizar_indice_filas()
+
+class EscritorPorLotes:
+    """
+    Acumula consumos en memoria y los escribe juntos cuando se juntan
+    max_filas o pasan intervalo_ms desde el último volcado (con fsync).
+    Los lectores del libro vacían lo pendiente antes de leer.
+    """
+
+    def __init__(self, max_filas=50, intervalo_ms=200):
+        self.max_filas = max_filas
+        self.intervalo = intervalo_ms / 1000
+        self._pendientes = []
+        self._condicion = threading.Condition()
+        self._hilo = threading.Thread(target=self._bucle, name='escritor-consumos', daemon=True)
+        self._hilo.start()
+        atexit.register(self.vaciar)
+
+    def agregar(self, registro):
+        with self._condicion:
+            self._pendientes.append(registro)
+            if len(self._pendientes) >= self.max_filas:
+                self._condicion.notify()
+
+    def vaciar(self):
+        """Escribe todo lo pendiente (en orden de llegada)"""
+        # Sin nada encolado no se toma el bloqueo de archivo (el hilo despierta cada intervalo)
+        with self._condicion:
+            if not self._pendientes:
+                return
+        with _bloqueo():
+            with self._condicion:
+                lote, self._pendientes = self._pendientes, []
+            if lote:
+                _escribir_lote(lote, fsync=True)
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait(timeout=self.intervalo)
+            self.vaciar()
+
+def activar_escritura_por_lotes(max_filas=50, intervalo_ms=200):
+    """Pasa a escribir los consumos por lotes en un hilo de fondo"""
+    global _escritor
+    with _bloqueo():
+        if _escritor is None:
+            _escritor = EscritorPorLotes(max_filas, intervalo_ms)
+    return _escritor
+
+def _vaciar_pendientes():
+    """Escribe los consumos encolados antes de leer o modificar el libro"""
+    if _escritor is not None:
+        _escritor.vaciar()
+
+def hay_consumos():
+    """True si hay libro de consumos (escribiendo antes lo encolado por el escritor por lotes)"""
+    _vaciar_pendientes()
+    return os.path.exists(DB_CONSUMOS)
+
+def registrar_consumo(registro):
+    """
+    Agrega un consumo al final del libro y lo suma a los totales (o lo
+    encola, si está activa la escritura por lotes).
+    Retorna el id asignado al consumo.
+    """
+    registro = {**registro, 'id': registro.get('id') or nuevo_id()}
+    if _escritor is not None:
+        _escritor.agregar(registro)
+    else:
+        _escribir_lote([registro])
+    return registro['id']
+
+def registrar_consumos(registros):
+    """
+    Agrega varios consumos en una sola escritura bajo bloqueo (cargas por lote
+    del bar o del punto de venta). Lo encolado por el escritor por lotes se
+    escribe antes, así el libro respeta el orden de llegada.
+    Retorna los ids asignados, en el mismo orden.
+    """
+    registros = [{**registro, 'id': registro.get('id') or nuevo_id()} for registro in registros]
+    if registros:
+        with _bloqueo():
+            _vaciar_pendientes()
+            _escribir_lote(registros, fsync=_escritor is not None)
+    return [registro['id'] for registro in registros]
+
+def _buscar_consumo(id_consumo):
+    """Recorre el libro hasta encontrar el consumo con ese id (sin cargarlo entero)"""
+    with open(DB_CONSUMOS, 'r', newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            if fila['id'] == id_consumo:
+                return fila
+    return None
+
+def eliminar_consumo(id_consumo):
+    """
+    Marca como eliminado el consumo con ese id (lápida) y lo descuenta de los
+    totales. El libro no se reescribe salvo que toque compactarlo.
+    Retorna el consumo eliminado, o None si no existe o ya estaba eliminado.
+    """
+    with _bloqueo():
+        _vaciar_pendientes()
+        _cargar_totales()
+        if not os.path.exists(DB_CONSUMOS):
+            return None
+
+        eliminados = _leer_eliminados()
+        if id_consumo in eliminados:
+            return None
+
+        consumo_eliminado = _buscar_consumo(id_consumo)
+        if consumo_eliminado is None:
+            return None
+
+        with open(DB_ELIMINADOS, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f, lineterminator='\n').writerow([id_consumo])
+
+        _sumar(_estado['totales'], consumo_eliminado['habitacion'], consumo_eliminado['pasajero'],
+               consumo_eliminado['categoria'], consumo_eliminado['monto'], signo=-1)
+        _guardar_totales()
+
+        if len(eliminados) + 1 >= UMBRAL_COMPACTACION:
+            compactar_libro()
+        return consumo_eliminado
+
+def compactar_libro(forzar=True):
+    """
+    Reescribe el libro sin los consumos eliminados y borra las lápidas.
+    Con forzar=False solo compacta si se superó UMBRAL_COMPACTACION.
+    Retorna la cantidad de consumos descartados.
+    """
+    with _bloqueo():
+        _vaciar_pendientes()
+        _cargar_totales()
+        eliminados = _leer_eliminados()
+        if not eliminados or (not forzar and len(eliminados) < UMBRAL_COMPACTACION):
+            return 0
+
+        df = leer_consumos()
+        _escribir_atomico(DB_CONSUMOS, df.to_csv(index=False, columns=COLUMNAS_CONSUMOS))
+        os.remove(DB_ELIMINADOS)
+
+        # Los totales no cambian, solo la firma del libro
+        _guardar_totales()
+        return len(eliminados)
+
+def archivar_temporada(etiqueta='reinicio_temporada'):
+    """
+    Guarda el libro compactado en el almacén de respaldos y lo deja vacío
+    (solo encabezado) con los totales en cero. Todo ocurre bajo un mismo
+    bloqueo: ningún consumo se escribe entre el respaldo y el vaciado, y lo
+    que el escritor por lotes encole mientras tanto queda para la temporada
+    nueva. Retorna la entrada del respaldo (ver respaldos.respaldar).
+    """
+    with _bloqueo():
+        # Escribe lo encolado hasta ahora y descarta los eliminados
+        compactar_libro()
+        entrada = respaldos.respaldar(DB_CONSUMOS, etiqueta)
+
+        # Archivo nuevo (otro inodo): los índices de filas de otros procesos se rehacen
+        _escribir_atomico(DB_CONSUMOS, ','.join(COLUMNAS_CONSUMOS) + '\n')
+        if os.path.exists(DB_ELIMINADOS):
+            os.remove(DB_ELIMINADOS)
+        _estado['totales'] = {}
+        _guardar_totales()
+        return entrada
+
+def _actualizar_indice_filas():
+    """
+    Agrega al índice de filas lo escrito en el libro desde la última vez
+    (solo se leen los bytes nuevos). Si el libro se reescribió, lo indexa entero.
+    """
+    try:
+        stat = os.stat(DB_CONSUMOS)
+    except FileNotFoundError:
+        _indice_filas.update(inodo=None, tamanio=0, filas={})
+        return
+    if stat.st_ino != _indice_filas['inodo'] or stat.st_size < _indice_filas['tamanio']:
+        _indice_filas.update(inodo=stat.st_ino, tamanio=0, filas={})
+    if stat.st_size == _indice_filas['tamanio']:
+        return
+
+    columna = COLUMNAS_CONSUMOS.index('habitacion')
+    filas = _indice_filas['filas']
+    with open(DB_CONSUMOS, 'rb') as f:
+        f.seek(_indice_filas['tamanio'])
+        if _indice_filas['tamanio'] == 0:
+            f.readline()  # Encabezado
+        offset = f.tell()
+        for linea in iter(f.readline, b''):
+            if not linea.endswith(b'\n'):
+                break  # Fila a medio escribir: se indexa la próxima vez
+            valores = next(csv.reader([linea.decode('utf-8')]), None)
+            if valores:
+                filas.setdefault(int(float(valores[columna])), []).append(offset)
+            offset += len(linea)
+    _indice_filas['tamanio'] = offset
+
+def folio(habitacion):
+    """
+    Consumos vigentes de la habitación y sus totales por categoría.
+    Las filas se leen directo de su posición en el libro (índice por
+    habitación) y los totales salen de los acumulados: no se recorre el libro.
+    Retorna (consumos, {categoria: total}).
+    """
+    habitacion = int(habitacion)
+    with _bloqueo():
+        _vaciar_pendientes()
+        _cargar_totales()
+        _actualizar_indice_filas()
+        eliminados = _leer_eliminados()
+
+        consumos = []
+        offsets = _indice_filas['filas'].get(habitacion, [])
+        metricas.contar('recepcion_libro_filas_leidas_total', len(offsets), almacen='csv')
+        if offsets:
+            with open(DB_CONSUMOS, 'rb') as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    consumo = dict(zip(COLUMNAS_CONSUMOS, next(csv.reader([f.readline().decode('utf-8')]))))
+                    if consumo['id'] in eliminados:
+                        continue
+                    consumo['habitacion'] = habitacion
+                    consumo['monto'] = float(consumo['monto'])
+                    consumos.append(consumo)
+
+        totales = {}
+        for (habitacion_total, _), entrada in _estado['totales'].items():
+            if habitacion_total == habitacion:
+                for categoria, monto in entrada['totales'].items():
+                    totales[categoria] = round(totales.get(categoria, 0.0) + monto, 2)
+    return consumos, totales
+
+def armar_tabla_totales(filas, categorias):
+    """
+    Arma la tabla de cierre a partir de {(habitacion, pasajero): {categoria: monto}}:
+    índice (habitacion, pasajero) y una columna por categoría (siempre
+    incluye las categorías pedidas, aunque estén en cero).
+    """
+    claves = sorted(filas)
+    indice = pd.MultiIndex.from_arrays(
+        [[habitacion for habitacion, _ in claves], [pasajero for _, pasajero in claves]],
+        names=['habitacion', 'pasajero']
+    )
+    tabla = pd.DataFrame([filas[clave] for clave in claves], index=indice)
+    for col in categorias:
+        if col not in tabla.columns:
+            tabla[col] = 0.0
+    return tabla.fillna(0)
+
+def tabla_totales(categorias):
+    """Retorna los totales como el pivot habitación × categoría de los cierres"""
+    with _bloqueo():
+        _vaciar_pendientes()
+        _cargar_totales()
+        filas = {clave: dict(entrada['totales']) for clave, entrada in _estado['totales'].items()}
+    return armar_tabla_totales(filas, categorias)
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'compactar':
+        print("Uso:")
+        print("  python libro_consumos.py compactar")
+        sys.exit(1)
+
+    descartados = compactar_libro()
+    print(f"✅ Libro compactado: {descartados} consumo(s) eliminado(s) descartado(s)")
+
+if __name__ == "__main__":
+    main()
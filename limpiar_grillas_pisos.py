@@ -3,17 +3,25 @@
 """
 Script independiente para limpiar el contenido dinámico de las pestañas
 de PISO e Ingresos en el archivo Grilla de Pax 2030.xlsx.
-Preserva los encabezados y borra todos los backups existentes.
+Preserva los encabezados, borra las copias sueltas BACKUP_*.xlsx de versiones
+anteriores y borra los objetos sin uso del almacén de respaldos (respaldos.py).
+Con --conservar N descarta además las versiones de cada archivo más allá de
+las últimas N (por defecto se conservan todas).
+
+Uso:
+    python limpiar_grillas_pisos.py [--conservar N] [--profile] [--pstats limpieza.pstats]
 """
 
-import openpyxl
-import sys
-import shutil
+import argparse
 import os
 import glob
-from datetime import datetime
 from pathlib import Path
 
+import historico
+import perfilado
+import respaldos
+from servicio_grilla import ServicioGrilla
+
 # Nombre del archivo XLSX a limpiar (DEBE COINCIDIR con procesar_reservas.py)
 EXCEL_FILE = "Grilla de Pax 2030.xlsx"
 
@@ -27,20 +35,20 @@ PISO_SHEET_NAMES = {
 # Nombre de la hoja de Ingresos
 INGRESOS_SHEET_NAME = 'Ingresos 23 D MAYO'
 
-# Columnas de datos a limpiar en las hojas de piso (C a L)
+# Huellas de reservas importadas (DEBE COINCIDIR con HUELLAS_FILE de procesar_reservas.py)
+HUELLAS_FILE = "reservas_importadas.json"
+
+# Columnas de datos a limpiar en las hojas de piso (C a L, y O)
 # C = Columna 3 (IN)
 # L = Columna 12 (ESTADO)
-COLUMNAS_DE_DATOS = range(3, 13)
-
-# Rango de filas máximo para la limpieza
-# Basado en la estructura de tu grilla, buscaremos hasta la fila 500 por seguridad.
-MAX_ROW_CLEAN = 500
+# O = Columna 15 (OBSERVACIONES, donde se marcan los pasajeros que regresan)
+COLUMNAS_DE_DATOS = (*range(3, 13), 15)
 
 # Fila donde empiezan los datos (después de encabezados)
 FILA_INICIO_DATOS = 2
 
 def borrar_backups():
-    """Borra todos los archivos de backup (BACKUP_*.xlsx) en el directorio actual."""
+    """Borra las copias sueltas de backup (BACKUP_*.xlsx) que dejaban las versiones anteriores."""
     patron_backups = "BACKUP_*.xlsx"
     archivos_backup = glob.glob(patron_backups)
     
@@ -62,30 +70,54 @@ def borrar_backups():
     return borrados
 
 def create_backup():
-    """Crea respaldo con timestamp antes de la limpieza para revertir si es necesario."""
+    """Respalda el libro antes de la limpieza para revertir si es necesario (ver respaldos.py)."""
     if not Path(EXCEL_FILE).exists():
         print(f"❌ ERROR: No se encontró el archivo '{EXCEL_FILE}'. Asegúrate de que existe.")
         return None
         
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"BACKUP_LIMPIEZA_{timestamp}_{EXCEL_FILE}"
-    shutil.copy2(EXCEL_FILE, backup_file)
-    print(f"✅ Respaldo de seguridad creado: {backup_file}")
-    return backup_file
-
-def limpiar_grillas():
-    """Ejecuta la limpieza de las hojas de PISO e Ingresos, preservando encabezados."""
-    
+    entrada = respaldos.respaldar(EXCEL_FILE, etiqueta='limpieza')
+    if entrada['nuevo']:
+        print(f"✅ Respaldo de seguridad creado: {respaldos.ruta_objeto(entrada)}")
+    else:
+        print(f"✅ Respaldo de seguridad al día (sin cambios desde {entrada['fecha']}): {entrada['hash'][:12]}")
+    return entrada
+
+def celdas_con_valor(ws, fila_inicio, columnas):
+    """
+    Celdas con contenido de la hoja a partir de fila_inicio dentro de las columnas
+    indicadas. Solo se miran las celdas que ya existen en la hoja: iter_rows()
+    crea cada coordenada del rango, y PISO 1 llega a la fila 2922 solo por el
+    formato (unas 36 mil celdas vacías nuevas, más lentas de guardar).
+    """
+    columnas = set(columnas)
+    return [
+        cell
+        for (fila, columna), cell in ws._cells.items()
+        if fila >= fila_inicio and columna in columnas and cell.value is not None
+    ]
+
+def limpiar_grillas(perfil=None, conservar=None):
+    """
+    Ejecuta la limpieza de las hojas de PISO e Ingresos, preservando encabezados.
+    perfil (perfilado.Perfil) registra el tiempo de cada fase y, con --profile,
+    la memoria pico.
+    """
+    if perfil is None:
+        perfil = perfilado.Perfil('limpiar_grillas_pisos')
+
     # 1. Crear respaldo antes de empezar
-    if not create_backup():
-        return False
+    with perfil.fase('Respaldo'):
+        if not create_backup():
+            return False
         
     # 2. Cargar Libro Excel
-    try:
-        wb = openpyxl.load_workbook(EXCEL_FILE)
-    except Exception as e:
-        print(f"❌ ERROR al abrir el archivo {EXCEL_FILE}: {e}")
-        return False
+    with perfil.fase('Carga del libro'):
+        servicio = ServicioGrilla(EXCEL_FILE)
+        try:
+            wb = servicio.libro()
+        except Exception as e:
+            print(f"❌ ERROR al abrir el archivo {EXCEL_FILE}: {e}")
+            return False
 
     total_celdas_limpiadas = 0
     
@@ -98,21 +130,17 @@ def limpiar_grillas():
             print(f"   ⚠️  Advertencia: La pestaña '{sheet_name}' no existe en el archivo. Saltando.")
             continue
             
-        ws = wb[sheet_name]
-        celdas_en_piso = 0
-        
         print(f"   Limpiando pestaña: '{sheet_name}'...")
         
-        # Iterar sobre las filas y columnas para borrar el contenido
-        # Empezamos desde FILA_INICIO_DATOS (2) para preservar encabezados
-        for row_idx in range(FILA_INICIO_DATOS, MAX_ROW_CLEAN + 1):
-            for col_idx in COLUMNAS_DE_DATOS:
-                
-                # Accedemos a la celda. Si tiene valor, lo borramos.
-                cell = ws.cell(row=row_idx, column=col_idx)
-                if cell.value is not None:
-                    cell.value = None
-                    celdas_en_piso += 1
+        with perfil.fase(f'Limpieza {sheet_name}'):
+            ws = servicio.hoja(sheet_name)
+
+            # Borrar el contenido de las columnas de datos de las celdas usadas
+            # Empezamos desde FILA_INICIO_DATOS (2) para preservar encabezados
+            celdas = celdas_con_valor(ws, FILA_INICIO_DATOS, COLUMNAS_DE_DATOS)
+            for cell in celdas:
+                cell.value = None
+            celdas_en_piso = len(celdas)
                     
         total_celdas_limpiadas += celdas_en_piso
         print(f"      ✅ Limpieza de '{sheet_name}' completada. Celdas vaciadas: {celdas_en_piso}")
@@ -120,18 +148,21 @@ def limpiar_grillas():
     # 4. Limpiar hoja de Ingresos (preservando encabezados en fila 1)
     print(f"\n📋 Limpiando pestaña de Ingresos (preservando encabezados)...")
     if INGRESOS_SHEET_NAME in wb.sheetnames:
-        ws_ingresos = wb[INGRESOS_SHEET_NAME]
-        celdas_ingresos = 0
-        
         print(f"   Limpiando pestaña: '{INGRESOS_SHEET_NAME}'...")
         
-        # Limpiar todas las columnas desde la fila 2 en adelante
-        for row_idx in range(FILA_INICIO_DATOS, MAX_ROW_CLEAN + 1):
-            for col_idx in range(1, 15):  # Columnas A-N (1-14)
-                cell = ws_ingresos.cell(row=row_idx, column=col_idx)
-                if cell.value is not None:
-                    cell.value = None
-                    celdas_ingresos += 1
+        with perfil.fase(f'Limpieza {INGRESOS_SHEET_NAME}'):
+            ws_ingresos = servicio.hoja(INGRESOS_SHEET_NAME)
+
+            # Los pasajeros de la temporada pasan al histórico (historico.db) antes de borrarlos
+            filas_ingresos = list(historico.filas_hoja(ws_ingresos, historico.ULTIMA_COLUMNA_INGRESOS))
+
+            # Ingresos es un histórico sin estructura fija: se eliminan de una vez
+            # todas las filas desde la 2 hasta la última usada (los datos llegan
+            # hasta OBSERVACIONES; el resto de las columnas solo tiene formato)
+            celdas_ingresos = len(celdas_con_valor(ws_ingresos, FILA_INICIO_DATOS,
+                                                   range(1, historico.ULTIMA_COLUMNA_INGRESOS + 1)))
+            if ws_ingresos.max_row >= FILA_INICIO_DATOS:
+                ws_ingresos.delete_rows(FILA_INICIO_DATOS, ws_ingresos.max_row - FILA_INICIO_DATOS + 1)
         
         total_celdas_limpiadas += celdas_ingresos
         print(f"      ✅ Limpieza de '{INGRESOS_SHEET_NAME}' completada. Celdas vaciadas: {celdas_ingresos}")
@@ -141,28 +172,66 @@ def limpiar_grillas():
     # 5. Guardar los cambios
     print("\n💾 Guardando archivo con las grillas limpias...")
     try:
-        wb.save(EXCEL_FILE)
+        with perfil.fase('Guardado'):
+            servicio.guardar()
         print(f"✅ Archivo guardado: {EXCEL_FILE}")
+
+        # Con las grillas vacías, la próxima importación delta debe importar todo
+        if os.path.exists(HUELLAS_FILE):
+            os.remove(HUELLAS_FILE)
+
+        estadias_historico = None
+        if INGRESOS_SHEET_NAME in wb.sheetnames:
+            with perfil.fase('Histórico de pasajeros'):
+                try:
+                    estadias_historico = historico.incorporar_filas(filas_ingresos)
+                except Exception as e:
+                    print(f"   ⚠️  No se pudo actualizar el histórico de pasajeros: {e}")
         
-        # 6. Borrar todos los backups
-        backups_borrados = borrar_backups()
+        # 6. Borrar las copias sueltas y aplicar la retención del almacén de respaldos
+        with perfil.fase('Backups y retención'):
+            backups_borrados = borrar_backups()
+            versiones_descartadas, _ = respaldos.podar(conservar)
+
+        perfil.datos.update({
+            'celdas_vaciadas': total_celdas_limpiadas,
+            'backups_borrados': backups_borrados,
+            'versiones_descartadas': versiones_descartadas,
+            'estadias_historico': estadias_historico,
+        })
         
         print("\n" + "="*70)
         print("✅ LIMPIEZA COMPLETADA EXITOSAMENTE")
         print("="*70)
         print(f"   Total de celdas vaciadas: {total_celdas_limpiadas}")
         print(f"   Archivos de backup borrados: {backups_borrados}")
+        print(f"   Versiones antiguas descartadas del almacén de respaldos: {versiones_descartadas}")
+        if estadias_historico is not None:
+            print(f"   Estadías agregadas al histórico de pasajeros: {estadias_historico}")
         print(f"   Ahora el archivo está listo para nuevas reservas.")
         print("="*70)
+        perfil.imprimir()
         
         return True
     except Exception as e:
         print(f"❌ ERROR al guardar: {e}")
         print(f"   Asegúrate de que el archivo '{EXCEL_FILE}' esté CERRADO.")
+        servicio.descartar()
         return False
 
 def main():
-    limpiar_grillas()
+    parser = argparse.ArgumentParser(
+        description='Limpia las pestañas de PISO e Ingresos de la grilla preservando encabezados'
+    )
+    parser.add_argument('--conservar', type=int, metavar='N',
+                        help='Conservar solo las últimas N versiones de cada archivo en el almacén '
+                             'de respaldos (default: todas)')
+    perfilado.agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    perfil = perfilado.desde_argumentos('limpiar_grillas_pisos', args)
+    exito = limpiar_grillas(perfil=perfil, conservar=args.conservar)
+    perfil.terminar(exito)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas de la app en memoria, exportadas en el formato de texto de Prometheus
+por la ruta /metrics:
+
+- recepcion_request_segundos: latencia de cada ruta (histograma)
+- recepcion_fase_segundos: tiempo de las fases internas de cada ruta
+  (lectura, pivot, render, serializacion, ...) (histograma)
+- recepcion_libro_filas_leidas_total / recepcion_libro_filas_escritas_total:
+  filas del libro de consumos leídas y escritas (contadores)
+
+Variables de entorno:
+
+    RECEPCION_METRICAS=0   desactiva la medición (fase() y contar() no hacen nada)
+    RECEPCION_LOG_JSON=1   además escribe una línea JSON por request en stderr,
+                           con la ruta, el código, la duración y sus fases
+
+Las métricas son de cada proceso: con varios workers de gunicorn/uvicorn cada
+worker informa las suyas (Prometheus las suma por instancia).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+ACTIVAS = os.environ.get('RECEPCION_METRICAS', '1') != '0'
+LOG_JSON = os.environ.get('RECEPCION_LOG_JSON', '0') == '1'
+
+# Límites (en segundos) de los baldes de los histogramas
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nombre -> (tipo, descripción) de cada métrica que se exporta
+DESCRIPCIONES = {
+    'recepcion_request_segundos': ('histogram', 'Latencia de los requests por ruta'),
+    'recepcion_requests_total': ('counter', 'Requests atendidos por ruta y código de respuesta'),
+    'recepcion_fase_segundos': ('histogram', 'Tiempo de las fases internas de cada ruta'),
+    'recepcion_libro_filas_leidas_total': ('counter', 'Filas del libro de consumos leídas'),
+    'recepcion_libro_filas_escritas_total': ('counter', 'Filas del libro de consumos escritas'),
+}
+
+# {(nombre, etiquetas): [cuenta por balde..., suma, cantidad]} y {(nombre, etiquetas): valor}
+_histogramas = {}
+_contadores = {}
+_lock = threading.Lock()
+
+# Request en curso ({'ruta': ..., 'fases': {...}}). Se copia al pool de reportes
+# junto con el contexto, así las fases medidas allí quedan con su ruta
+_request_actual = ContextVar('request_actual', default=None)
+
+_SIN_MEDICION = nullcontext()
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+def observar(nombre, segundos, **etiquetas):
+    """Suma una observación (en segundos) al histograma"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        valores = _histogramas.get(clave)
+        if valores is None:
+            valores = _histogramas[clave] = [0] * len(LIMITES_SEGUNDOS) + [0.0, 0]
+        for i, limite in enumerate(LIMITES_SEGUNDOS):
+            if segundos <= limite:
+                valores[i] += 1
+        valores[-2] += segundos
+        valores[-1] += 1
+
+def contar(nombre, cantidad=1, **etiquetas):
+    """Suma cantidad al contador"""
+    if not ACTIVAS:
+        return
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + cantidad
+
+@contextmanager
+def _medir_fase(nombre, actual):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        ruta = actual['ruta'] if actual else 'fuera_de_request'
+        observar('recepcion_fase_segundos', segundos, ruta=ruta, fase=nombre)
+        if actual is not None:
+            actual['fases'][nombre] = round(actual['fases'].get(nombre, 0) + segundos, 6)
+
+def fase(nombre):
+    """
+    Mide el bloque como una fase de la ruta en curso:
+
+        with metricas.fase('pivot'):
+            tabla = almacen.tabla_totales(...)
+    """
+    return _medir_fase(nombre, _request_actual.get()) if ACTIVAS else _SIN_MEDICION
+
+def medir_generador(nombre, generador):
+    """
+    Mide como fase lo que tarda en recorrerse una respuesta enviada por partes
+    (stream_template): el render ocurre recién mientras se envía.
+    """
+    if not ACTIVAS:
+        return generador
+    actual = _request_actual.get()
+
+    def medido():
+        with _medir_fase(nombre, actual):
+            yield from generador
+
+    return medido()
+
+def _al_empezar():
+    from flask import request
+
+    # Se agrupa por la regla ('/habitacion/<int:habitacion>/folio'), no por la URL
+    ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+    _request_actual.set({'inicio': time.perf_counter(), 'ruta': ruta, 'fases': {}})
+
+def _al_responder(response):
+    from flask import request
+
+    actual = _request_actual.get()
+    if actual is None:
+        return response
+    ruta, metodo, codigo = actual['ruta'], request.method, response.status_code
+
+    def terminar():
+        segundos = time.perf_counter() - actual['inicio']
+        observar('recepcion_request_segundos', segundos, ruta=ruta, metodo=metodo)
+        contar('recepcion_requests_total', ruta=ruta, metodo=metodo, codigo=str(codigo))
+        if LOG_JSON:
+            print(json.dumps({
+                'momento': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'ruta': ruta,
+                'metodo': metodo,
+                'codigo': codigo,
+                'segundos': round(segundos, 6),
+                'fases': actual['fases'],
+            }, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    if response.is_streamed and not response.direct_passthrough:
+        # Cuerpo enviado por partes (stream_template): se mide al cerrar la respuesta
+        response.call_on_close(terminar)
+    else:
+        # Cuerpo ya armado (o archivo en memoria que el servidor envía directo)
+        terminar()
+    return response
+
+def _formato(etiquetas):
+    if not etiquetas:
+        return ''
+    pares = ','.join(
+        '{}="{}"'.format(clave, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for clave, valor in etiquetas
+    )
+    return '{' + pares + '}'
+
+def exportar():
+    """Todas las métricas en el formato de texto de Prometheus"""
+    with _lock:
+        histogramas = {clave: list(valores) for clave, valores in _histogramas.items()}
+        contadores = dict(_contadores)
+
+    lineas = []
+    for nombre, (tipo, descripcion) in DESCRIPCIONES.items():
+        lineas.append(f'# HELP {nombre} {descripcion}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        if tipo == 'counter':
+            for (clave_nombre, etiquetas), valor in sorted(contadores.items()):
+                if clave_nombre == nombre:
+                    lineas.append(f'{nombre}{_formato(etiquetas)} {valor}')
+            continue
+        for (clave_nombre, etiquetas), valores in sorted(histogramas.items()):
+            if clave_nombre != nombre:
+                continue
+            for limite, cuenta in zip(LIMITES_SEGUNDOS, valores):
+                lineas.append(f'{nombre}_bucket{_formato(etiquetas + (("le", str(limite)),))} {cuenta}')
+            lineas.append(f'{nombre}_bucket{_formato(etiquetas + (("le", "+Inf"),))} {valores[-1]}')
+            lineas.append(f'{nombre}_sum{_formato(etiquetas)} {valores[-2]:.6f}')
+            lineas.append(f'{nombre}_count{_formato(etiquetas)} {valores[-1]}')
+    return '\n'.join(lineas) + '\n'
+
+def instrumentar(app):
+    """Registra la medición de requests en la app y la ruta /metrics"""
+    if ACTIVAS:
+        app.before_request(_al_empezar)
+        app.after_request(_al_responder)
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas del proceso en formato Prometheus"""
+        contenido = exportar() if ACTIVAS else '# Métricas desactivadas (RECEPCION_METRICAS=0)\n'
+        return contenido, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
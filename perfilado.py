@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tiempos por fase de los scripts de la grilla (procesar_reservas.py y
+limpiar_grillas_pisos.py) y perfilado opcional con --profile.
+
+Siempre se mide el tiempo de cada fase (es gratis). Con --profile además:
+
+- memoria pico de cada fase (tracemalloc: lo que asigna Python, incluido openpyxl)
+  y el RSS máximo del proceso al terminarla
+- un resumen JSON por corrida agregado a perfiles_grilla.jsonl (una línea por
+  corrida, para comparar entre temporadas; otro archivo con --perfil-json)
+- con --pstats ARCHIVO, el volcado de cProfile para analizar con pstats/snakeviz:
+
+    python procesar_reservas.py reservas.csv --profile --pstats importacion.pstats
+    python -m pstats importacion.pstats
+
+tracemalloc hace más lentas las fases con muchas asignaciones: los tiempos con
+--profile sirven para comparar corridas perfiladas entre sí.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: sin RSS máximo
+    resource = None
+
+# Historial de corridas perfiladas (una línea JSON por corrida)
+ARCHIVO_PERFILES = 'perfiles_grilla.jsonl'
+
+def _rss_maximo_mb():
+    """RSS máximo del proceso hasta ahora, en MB (None si el sistema no lo informa)"""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KB, macOS en bytes
+    return round(maximo / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class Perfil:
+    """
+    Fases de una corrida: tiempo siempre; memoria, resumen JSON y cProfile
+    solo si activo (--profile).
+
+        perfil = Perfil('procesar_reservas', activo=True)
+        with perfil.fase('Carga del libro'):
+            ...
+        perfil.terminar(exito=True)
+    """
+
+    def __init__(self, script, activo=False, archivo_json=ARCHIVO_PERFILES, archivo_pstats=None):
+        self.script = script
+        self.activo = activo
+        self.archivo_json = archivo_json
+        self.archivo_pstats = archivo_pstats if activo else None
+        self.fases = []
+        self.datos = {}
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now()
+        self._perfilador = None
+        if self.activo:
+            tracemalloc.start()
+            if self.archivo_pstats:
+                self._perfilador = cProfile.Profile()
+                self._perfilador.enable()
+
+    @contextmanager
+    def fase(self, nombre):
+        """Mide el bloque como una fase (las fases no se anidan)"""
+        if self.activo:
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            entrada = {'fase': nombre, 'segundos': round(time.perf_counter() - inicio, 4)}
+            if self.activo:
+                entrada['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+                entrada['rss_maximo_mb'] = _rss_maximo_mb()
+            self.fases.append(entrada)
+
+    def segundos_total(self):
+        return round(time.perf_counter() - self.inicio, 4)
+
+    def imprimir(self):
+        """Tabla de tiempos (y memoria si está activo) por fase"""
+        print("\n⏱️  Tiempos:")
+        for entrada in self.fases:
+            memoria = ''
+            if self.activo:
+                memoria = f"  (pico {entrada['memoria_pico_mb']:.1f} MB"
+                if entrada['rss_maximo_mb'] is not None:
+                    memoria += f", RSS {entrada['rss_maximo_mb']:.0f} MB"
+                memoria += ")"
+            print(f"   • {entrada['fase']}: {entrada['segundos']:.3f} s{memoria}")
+        print(f"   • Total: {self.segundos_total():.3f} s")
+
+    def terminar(self, exito):
+        """
+        Cierra la corrida: con --profile agrega el resumen JSON al historial y
+        guarda el volcado de cProfile. Retorna el resumen (None si no está activo).
+        """
+        if not self.activo:
+            return None
+
+        if self._perfilador is not None:
+            self._perfilador.disable()
+            self._perfilador.dump_stats(self.archivo_pstats)
+            print(f"🔬 Perfil de cProfile guardado: {self.archivo_pstats} (ver con: python -m pstats {self.archivo_pstats})")
+
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        resumen = {
+            'script': self.script,
+            'fecha': self.fecha.isoformat(timespec='seconds'),
+            'argumentos': sys.argv[1:],
+            'exito': exito,
+            'segundos_total': self.segundos_total(),
+            'memoria_pico_mb': round(pico / 1024 / 1024, 1),
+            'rss_maximo_mb': _rss_maximo_mb(),
+            'fases': self.fases,
+            'datos': self.datos,
+        }
+        with open(self.archivo_json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resumen, ensure_ascii=False) + '\n')
+        print(f"📈 Resumen de perfilado agregado a: {os.path.abspath(self.archivo_json)}")
+        return resumen
+
+def agregar_argumentos(parser):
+    """Opciones --profile y --pstats comunes a los scripts de la grilla"""
+    parser.add_argument('--profile', '--perfil', action='store_true', dest='perfil',
+                        help='Mide la memoria pico de cada fase y agrega un resumen JSON de la corrida '
+                             f'a {ARCHIVO_PERFILES}')
+    parser.add_argument('--perfil-json', metavar='ARCHIVO', default=ARCHIVO_PERFILES,
+                        help=f'Con --profile, archivo donde se agrega el resumen (default: {ARCHIVO_PERFILES})')
+    parser.add_argument('--pstats', metavar='ARCHIVO',
+                        help='Con --profile, guarda además el perfil de cProfile en ARCHIVO')
+
+def desde_argumentos(script, args):
+    """Perfil de la corrida según las opciones de agregar_argumentos()"""
+    if args.pstats and not args.perfil:
+        print("ℹ️  --pstats se usa junto con --profile: se activa el perfilado")
+        args.perfil = True
+    return Perfil(script, activo=args.perfil, archivo_json=args.perfil_json, archivo_pstats=args.pstats)
@@ -5,16 +5,27 @@ Procesador unificado de reservas para Excel (XLSX) con Openpyxl.
 Importa datos del CSV a la hoja Ingresos Y los distribuye a los pisos en un solo paso.
 """
 
-import openpyxl
+import argparse
 import csv
+import glob
+import json
+import os
 import sys
-import shutil
-from datetime import datetime
+import time
 from pathlib import Path
 from collections import defaultdict
 
+import historico
+import perfilado
+import respaldos
+from servicio_grilla import ServicioGrilla
+
 EXCEL_FILE = "Grilla de Pax 2030.xlsx"
 
+# Huellas de las reservas ya importadas a la grilla (para la importación delta)
+# limpiar_grillas_pisos.py lo borra junto con las grillas
+HUELLAS_FILE = "reservas_importadas.json"
+
 # Mapeo de habitaciones a pisos
 PISO_RANGES = {
     'PISO_1': (101, 121),
@@ -47,16 +58,17 @@ MAPPING = {
 }
 
 def create_backup():
-    """Crea respaldo con timestamp"""
+    """Respalda el libro en el almacén de respaldos (no duplica versiones sin cambios)"""
     if not Path(EXCEL_FILE).exists():
         print(f"❌ ERROR: No se encontró el archivo '{EXCEL_FILE}'. No se pudo crear el respaldo.")
         return None
         
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"BACKUP_{timestamp}_{EXCEL_FILE}"
-    shutil.copy2(EXCEL_FILE, backup_file)
-    print(f"✅ Respaldo de seguridad creado: {backup_file}")
-    return backup_file
+    entrada = respaldos.respaldar(EXCEL_FILE, etiqueta='importacion')
+    if entrada['nuevo']:
+        print(f"✅ Respaldo de seguridad creado: {respaldos.ruta_objeto(entrada)}")
+    else:
+        print(f"✅ Respaldo de seguridad al día (sin cambios desde {entrada['fecha']}): {entrada['hash'][:12]}")
+    return entrada
 
 def get_piso_for_room(room_number):
     """Determina a qué piso pertenece una habitación"""
@@ -69,6 +81,44 @@ def get_piso_for_room(room_number):
     except ValueError:
         return None
 
+# Columnas de la hoja Ingresos (basado en el CSV compartido)
+# A=HAB(1), B=IN(2), C=OUT(3), D=PAX(4), E=ID(5), F=N.º(6), G=NOMBRE(7), H=EDAD(8),
+# I=VOUCHER(9), J=MAP(10), K=ESTADO(11), L=BENEFICIO(12), M=SEDE(13)
+COLUMNAS_INGRESOS = ('HAB', 'IN', 'OUT', 'PAX', 'ID', 'N.º', 'NOMBRE', 'EDAD',
+                     'VOUCHER', 'MAP', 'ESTADO', 'BENEFICIO', 'SEDE')
+
+# Servicios con cena (Media Pensión). Se chequea la cadena de texto
+MAP_KEYWORDS = {'MEDIA PENSION', 'MEDIA PENSIÓN', 'ALL INCLUSIVE'} # Añadimos All Inclusive por si acaso
+
+def iterar_registros(csv_file):
+    """
+    Generador: lee el CSV fila por fila y entrega cada registro ya mapeado y
+    con su piso asignado, sin cargar el archivo completo en memoria.
+    Lanza ValueError si faltan columnas requeridas.
+    """
+    with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)  # Usar delimitador por defecto (coma)
+
+        # Crear mapeo de columnas con strip para acceso flexible
+        col_map = {col.strip(): col for col in (reader.fieldnames or [])}
+
+        # Verificar que el CSV tenga las columnas esperadas
+        missing_cols = [col for col in MAPPING.keys() if col not in col_map]
+        if missing_cols:
+            raise ValueError(f"Columnas faltantes: {missing_cols}")
+
+        for row in reader:
+            registro = {clave: row[col_map[col]] for col, clave in MAPPING.items()}
+            registro['OBSERVACIONES'] = (row.get('OBSERVACIONES') or '').strip() or None
+
+            # Asignar piso
+            piso = get_piso_for_room(registro['HAB'])
+            if piso:
+                registro['PISO'] = piso
+                yield registro
+            else:
+                print(f"   ⚠️  Advertencia: Habitación {registro['HAB']} sin piso asignado. Saltando.")
+
 def read_csv_data(csv_file):
     """Lee el archivo CSV y retorna la lista de registros y habitaciones únicas."""
     
@@ -76,59 +126,63 @@ def read_csv_data(csv_file):
     habitaciones_unicas = set()
     
     try:
-        with open(csv_file, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)  # Usar delimitador por defecto (coma)
-            
-            # Crear mapeo de columnas con strip para acceso flexible
-            col_map = {col.strip(): col for col in reader.fieldnames}
-            
-            # Verificar que el CSV tenga las columnas esperadas
-            missing_cols = []
-            for col in MAPPING.keys():
-                if col not in col_map:
-                    missing_cols.append(col)
-            
-            if missing_cols:
-                print("❌ ERROR: El archivo CSV no contiene todas las columnas requeridas.")
-                print(f"   Columnas faltantes: {missing_cols}")
-                return [], set()
-
-            for row in reader:
-                registro = {
-                    'HAB': row[col_map['Nro. habitación']],
-                    'IN': row[col_map['Fecha de ingreso']],
-                    'OUT': row[col_map['Fecha de egreso']],
-                    'PAX': row[col_map['Plazas ocupadas']],
-                    'ID': row[col_map['Tipo documento']],
-                    'N.º': row[col_map['Nro. doc.']],
-                    'NOMBRE': row[col_map['Apellido y nombre']],
-                    'EDAD': row[col_map['Edad']],
-                    'VOUCHER': row[col_map['Voucher']],
-                    'MAP': row[col_map['Servicios']],
-                    'ESTADO': row[col_map['Estado']],
-                    'BENEFICIO': row[col_map['Paquete']],
-                    'SEDE': row[col_map['Sede']],
-                    'OBSERVACIONES': row.get('OBSERVACIONES', '')
-                }
-                
-                # Asignar piso
-                piso = get_piso_for_room(registro['HAB'])
-                if piso:
-                    registro['PISO'] = piso
-                    registros.append(registro)
-                    habitaciones_unicas.add(registro['HAB'])
-                else:
-                    print(f"   ⚠️  Advertencia: Habitación {registro['HAB']} sin piso asignado. Saltando.")
-
+        for registro in iterar_registros(csv_file):
+            registros.append(registro)
+            habitaciones_unicas.add(registro['HAB'])
     except FileNotFoundError:
         print(f"❌ ERROR: Archivo CSV '{csv_file}' no encontrado.")
         return [], set()
+    except ValueError as e:
+        print("❌ ERROR: El archivo CSV no contiene todas las columnas requeridas.")
+        print(f"   {e}")
+        return [], set()
     except Exception as e:
         print(f"❌ ERROR al leer el CSV: {e}")
         return [], set()
 
     return registros, habitaciones_unicas
 
+def huella_reserva(registro):
+    """Identifica una reserva por habitación + documento + fechas de ingreso y egreso"""
+    return '|'.join(str(registro[clave]).strip() for clave in ('HAB', 'N.º', 'IN', 'OUT'))
+
+def cargar_huellas():
+    """
+    Lee las huellas de la última importación:
+    {'huellas': [...], 'habitaciones': {'PISO 1|101': [huellas en la grilla]}}
+    """
+    try:
+        with open(HUELLAS_FILE, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+    except FileNotFoundError:
+        return {'huellas': [], 'habitaciones': {}}
+    except (OSError, ValueError) as e:
+        print(f"   ⚠️  No se pudo leer {HUELLAS_FILE} ({e}). Se importa todo.")
+        return {'huellas': [], 'habitaciones': {}}
+    estado.setdefault('huellas', [])
+    estado.setdefault('habitaciones', {})
+    return estado
+
+def guardar_huellas(estado):
+    """Escribe las huellas con archivo temporal + rename"""
+    temporal = f"{HUELLAS_FILE}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporal, HUELLAS_FILE)
+
+def marcar_regreso(registro, indice_historico):
+    """
+    Si el documento tiene estadías anteriores en el histórico (historico.py),
+    agrega la marca a OBSERVACIONES. Es un acceso al índice en memoria por
+    registro, sin consultas a la base. Retorna True si el pasajero regresa.
+    """
+    cantidad, ultima = historico.estadias_previas(indice_historico, registro['N.º'], registro['IN'])
+    if not cantidad:
+        return False
+    marca = f"REGRESA: {cantidad} estadía(s) anterior(es), última {ultima}"
+    registro['OBSERVACIONES'] = ' - '.join(filter(None, (registro['OBSERVACIONES'], marca)))
+    return True
+
 def agrupar_por_habitacion(registros):
     """Agrupa los registros leídos por número de habitación."""
     reservas_agrupadas = defaultdict(list)
@@ -138,140 +192,321 @@ def agrupar_por_habitacion(registros):
         reservas_agrupadas[key].append(registro)
     return reservas_agrupadas
 
-def procesar_reservas(csv_file):
+def filas_combinadas(ws, col_inicio=3, col_fin=12):
+    """Filas con alguna celda combinada de solo lectura entre las columnas de datos (C a L)"""
+    filas = set()
+    for rango in ws.merged_cells.ranges:
+        if rango.max_col < col_inicio or rango.min_col > col_fin:
+            continue
+        for fila in range(rango.min_row, rango.max_row + 1):
+            # La celda superior izquierda del rango sí se puede escribir
+            if fila > rango.min_row or rango.min_col < col_inicio:
+                filas.add(fila)
+    return filas
+
+def indexar_habitaciones(ws):
+    """
+    Recorre una sola vez la columna B (HAB) de una hoja de piso y retorna
+    {número de habitación: (fila, capacidad)} para ubicar cada habitación sin
+    volver a escanear. La capacidad es la cantidad de filas del bloque de la
+    habitación (hasta el rótulo siguiente, p. ej. 'BEBIDAS', o una celda combinada).
+    """
+    indice = {}
+    rotulos = []
+    for row_idx, (valor,) in enumerate(ws.iter_rows(min_col=2, max_col=2, values_only=True), start=1):
+        if valor is not None:
+            rotulos.append(row_idx)
+            # Si una habitación aparece dos veces, vale la primera fila (como antes)
+            indice.setdefault(str(valor).strip(), row_idx)
+
+    bloqueadas = filas_combinadas(ws)
+    siguiente = dict(zip(rotulos, rotulos[1:] + [ws.max_row + 1]))
+    for habitacion, fila in indice.items():
+        capacidad = 0
+        while fila + capacidad < siguiente[fila] and fila + capacidad not in bloqueadas:
+            capacidad += 1
+        indice[habitacion] = (fila, capacidad)
+    return indice
+
+def primera_fila_vacia(ws, fila_inicio=2):
+    """Primera fila desde fila_inicio con la columna A (HAB) vacía, en una sola pasada"""
+    for row_idx, (valor,) in enumerate(ws.iter_rows(min_row=fila_inicio, max_col=1, values_only=True),
+                                       start=fila_inicio):
+        if valor is None:
+            return row_idx
+    return max(ws.max_row + 1, fila_inicio)
+
+# Columnas de las hojas de piso (C a L) y la clave del registro que va en cada una
+COLUMNAS_PISO = (
+    (3, 'IN'),        # C = IN
+    (4, 'OUT'),       # D = OUT
+    (5, 'PAX'),       # E = PAX
+    # !!! CORRECCIÓN CRÍTICA DE MAPEO DE DNI Y NÚMERO !!!
+    (6, 'N.º'),       # F = DNI (Número de Documento)
+    (7, 'ID'),        # G = NUMERO (Tipo de Documento)
+    (8, 'NOMBRE'),    # H = NOMBRE
+    (9, 'EDAD'),      # I = EDAD
+    (10, 'VOUCHER'),  # J = VOUCHER
+    (11, 'MAP'),      # K = COMIDA
+    (12, 'ESTADO'),   # L = ESTADO
+    (15, 'OBSERVACIONES'),  # O = OBSERVACIONES (p. ej. pasajeros que regresan)
+)
+
+def planificar_piso(sheet_name, habitaciones, indice, ocupantes_anteriores, delta):
+    """
+    Calcula las escrituras de una hoja de piso sin tocar el libro; después
+    se aplica el lote en su hoja.
+
+    habitaciones: lista de (número, pax que entran en el bloque, pax sin lugar)
+    Retorna un dict con 'escrituras' [(fila, columna, valor)], 'pax', 'sin_cambios',
+    'ocupantes' {clave de habitación: huellas} y 'avisos' (mensajes a mostrar).
+    """
+    plan = {'escrituras': [], 'pax': 0, 'sin_cambios': 0, 'ocupantes': {}, 'avisos': []}
+
+    for room_number, pax_list, sin_lugar in habitaciones:
+        # Buscar el número de habitación en la columna B (índice 2)
+        current_row, _ = indice.get(str(room_number), (None, 0))
+        if current_row is None:
+            plan['avisos'].append(f"      ⚠️  HAB {room_number} NO encontrada en {sheet_name}")
+            continue
+
+        clave_habitacion = f"{sheet_name}|{room_number}"
+        ocupantes = [data['HUELLA'] for data in pax_list]
+        anteriores = ocupantes_anteriores.get(clave_habitacion, [])
+        plan['ocupantes'][clave_habitacion] = ocupantes
+        if delta and ocupantes == anteriores:
+            plan['sin_cambios'] += 1
+            continue
+
+        # Pasajeros de esa habitación en filas consecutivas
+        for data in pax_list:
+            plan['escrituras'].extend((current_row, col, data[clave]) for col, clave in COLUMNAS_PISO)
+            plan['pax'] += 1
+            current_row += 1  # Siguiente fila para el próximo pax
+
+        # En modo delta, si la habitación tiene menos ocupantes que antes se vacían las filas sobrantes
+        if delta:
+            for fila in range(current_row, current_row + len(anteriores) - len(ocupantes)):
+                plan['escrituras'].extend((fila, col, None) for col, _ in COLUMNAS_PISO)
+
+        if sin_lugar:
+            plan['avisos'].append(f"      ⚠️  HAB {room_number}: {sin_lugar} pax sin lugar en la grilla de {sheet_name}")
+
+    return plan
+
+def expandir_archivos(patrones):
+    """
+    Expande los patrones glob (p. ej. 'exports/*.csv') respetando el orden
+    recibido y sin repetir archivos. Un nombre sin comodines se deja tal cual
+    para que, si no existe, se informe el error al leerlo.
+    """
+    archivos = []
+    for patron in patrones:
+        if glob.has_magic(patron):
+            coincidencias = sorted(glob.glob(patron))
+            if not coincidencias:
+                print(f"   ⚠️  Advertencia: ningún archivo coincide con '{patron}'")
+        else:
+            coincidencias = [patron]
+        for archivo in coincidencias:
+            if archivo not in archivos:
+                archivos.append(archivo)
+    return archivos
+
+def procesar_reservas(csv_files, delta=False, perfil=None):
+    """
+    Importa uno o varios CSV (una ruta o una lista de rutas) en una sola
+    sesión del libro: un respaldo, una carga y un guardado para todos.
+    Las habitaciones se distribuyen como si los archivos fueran uno solo,
+    en el orden recibido. Si un archivo falla no se guarda nada.
+
+    Cada CSV se importa en streaming: cada fila se escribe en Ingresos apenas se
+    lee y las métricas se calculan al vuelo. Solo se guardan en memoria los
+    pax de cada habitación que entran en su bloque de la grilla de piso,
+    así que el consumo de memoria no crece con el tamaño del export.
+
+    Con delta=True solo se agregan a Ingresos las reservas que no se habían
+    importado antes y solo se reescriben las habitaciones cuyos ocupantes
+    cambiaron respecto de la importación anterior (ver HUELLAS_FILE).
+
+    perfil (perfilado.Perfil) registra el tiempo de cada fase y, con --profile,
+    la memoria pico; los datos de la corrida quedan en perfil.datos.
+    """
+    if perfil is None:
+        perfil = perfilado.Perfil('procesar_reservas')
+    if isinstance(csv_files, (str, Path)):
+        csv_files = [csv_files]
     
     # 1. Crear Respaldo
-    if not create_backup():
-        return False
-        
-    # 2. Leer CSV y Mapear Datos
-    print("\n1️⃣ Leyendo y mapeando datos del CSV...")
-    registros, habitaciones_unicas = read_csv_data(csv_file)
-    if not registros:
-        print("❌ No hay registros válidos para procesar. Abortando.")
-        return False
+    with perfil.fase('Respaldo'):
+        if not create_backup():
+            return False
+
+    # 2. Cargar Libro Excel (una vez para todos los CSV de la importación)
+    with perfil.fase('Carga del libro'):
+        servicio = ServicioGrilla(EXCEL_FILE)
+        try:
+            wb = servicio.libro()
+        except FileNotFoundError:
+            print(f"❌ ERROR: El archivo '{EXCEL_FILE}' no se encuentra.")
+            return False
+        except Exception as e:
+            print(f"❌ ERROR al cargar el libro Excel: {e}")
+            return False
+
+        ws_ingresos = servicio.hoja(PISO_SHEET_NAMES['INGRESOS'])
+
+        # Índice habitación -> (fila, capacidad) de cada hoja, armado una sola vez por hoja
+        indices_pisos = {
+            sheet_name: indexar_habitaciones(wb[sheet_name])
+            for key, sheet_name in PISO_SHEET_NAMES.items()
+            if key != 'INGRESOS' and sheet_name in wb.sheetnames
+        }
+
+    with perfil.fase('Huellas e histórico de pasajeros'):
+        estado_huellas = cargar_huellas()
+        huellas_importadas = set(estado_huellas['huellas'])
+        ocupantes_anteriores = estado_huellas['habitaciones']
+        repetidas = 0
+
+        # Documentos con estadías anteriores (historico.db), cargados una vez para toda la importación
+        indice_historico = historico.indice_documentos()
+        regresos = 0
+
+    # 3. Leer cada CSV e importar a Ingresos (Append) fila por fila
+    print(f"\n1️⃣ Leyendo {len(csv_files)} CSV e importando a la hoja de Ingresos (streaming)...")
+    if delta:
+        print(f"   🔁 Modo delta: {len(huellas_importadas)} reservas ya importadas")
+    if indice_historico:
+        print(f"   🗂️  Histórico de pasajeros: {len(indice_historico)} documentos")
+    else:
+        print(f"   ℹ️  Sin histórico de pasajeros ({historico.DB_HISTORICO}): no se marcan regresos")
+
+    # Buscar desde la fila 2 (después de encabezados) la primera fila con HAB vacía
+    row_idx = primera_fila_vacia(ws_ingresos)
 
     # --------------------------------------------------------------------------
-    # 📊 CÁLCULO DE MÉTRICAS DINÁMICAS
+    # 📊 CÁLCULO DE MÉTRICAS DINÁMICAS (al vuelo)
     # --------------------------------------------------------------------------
-    total_pax = len(registros)
-    total_habitaciones = len(habitaciones_unicas)
+    total_pax = 0
+    habitaciones_unicas = set()
     total_map = 0
 
-    # Contar servicios con cena (Media Pensión). Se chequea la cadena de texto
-    MAP_KEYWORDS = {'MEDIA PENSION', 'MEDIA PENSIÓN', 'ALL INCLUSIVE'} # Añadimos All Inclusive por si acaso
-    for registro in registros:
-        servicios = str(registro['MAP']).upper()
-        if any(keyword in servicios for keyword in MAP_KEYWORDS):
-            total_map += 1
+    # Pax por (piso, habitación), solo hasta la capacidad de su bloque
+    reservas_agrupadas = defaultdict(list)
+    sin_lugar = defaultdict(int)
+    resumen_archivos = []
 
-    print(f"📊 Cálculos Completados: Pax={total_pax}, Habitaciones={total_habitaciones}, Cenas(MP)={total_map}")
-    # --------------------------------------------------------------------------
+    for csv_file in csv_files:
+        inicio_archivo = time.perf_counter()
+        resumen = {'archivo': str(csv_file), 'registros': 0, 'repetidas': 0}
+        # Lectura del CSV y escritura en Ingresos van juntas (streaming): se miden como una fase
+        with perfil.fase(f'CSV {Path(csv_file).name} → Ingresos'):
+            try:
+                for registro in iterar_registros(csv_file):
+                    resumen['registros'] += 1
+                    registro['HUELLA'] = huella_reserva(registro)
+                    if marcar_regreso(registro, indice_historico):
+                        regresos += 1
+                    if delta and registro['HUELLA'] in huellas_importadas:
+                        resumen['repetidas'] += 1
+                    else:
+                        for col, clave in enumerate(COLUMNAS_INGRESOS, start=1):
+                            ws_ingresos.cell(row_idx, col, registro[clave])
+                        # Observaciones (Columna N)
+                        ws_ingresos.cell(row_idx, 14, registro['OBSERVACIONES'])
+                        row_idx += 1 # Avanzar a la siguiente fila
+                        huellas_importadas.add(registro['HUELLA'])
 
-    # 3. Cargar Libro Excel
-    try:
-        wb = openpyxl.load_workbook(EXCEL_FILE)
-    except FileNotFoundError:
-        print(f"❌ ERROR: El archivo '{EXCEL_FILE}' no se encuentra.")
-        return False
-    except Exception as e:
-        print(f"❌ ERROR al cargar el libro Excel: {e}")
+                    total_pax += 1
+                    habitaciones_unicas.add(registro['HAB'])
+                    servicios = str(registro['MAP']).upper()
+                    if any(keyword in servicios for keyword in MAP_KEYWORDS):
+                        total_map += 1
+
+                    # La clave de agrupación es (Número de Piso, Número de Habitación)
+                    key = (registro['PISO'], registro['HAB'])
+                    _, capacidad = indices_pisos.get(registro['PISO'], {}).get(str(registro['HAB']), (None, 1))
+                    if len(reservas_agrupadas[key]) < capacidad:
+                        reservas_agrupadas[key].append(registro)
+                    else:
+                        sin_lugar[key] += 1
+            except FileNotFoundError:
+                print(f"❌ ERROR: Archivo CSV '{csv_file}' no encontrado.")
+                servicio.descartar()
+                return False
+            except ValueError as e:
+                print(f"❌ ERROR: El archivo CSV '{csv_file}' no contiene todas las columnas requeridas.")
+                print(f"   {e}")
+                servicio.descartar()
+                return False
+            except Exception as e:
+                print(f"❌ ERROR al leer el CSV '{csv_file}': {e}")
+                servicio.descartar()
+                return False
+
+        resumen['segundos'] = time.perf_counter() - inicio_archivo
+        resumen_archivos.append(resumen)
+        print(f"   📄 {csv_file}: {resumen['registros']} registros, "
+              f"{resumen['registros'] - resumen['repetidas']} nuevos ({resumen['segundos']:.2f} s)")
+
+    repetidas = sum(resumen['repetidas'] for resumen in resumen_archivos)
+
+    if not total_pax:
+        print("❌ No hay registros válidos para procesar. Abortando.")
+        servicio.descartar()
         return False
 
-    ws_ingresos = wb[PISO_SHEET_NAMES['INGRESOS']]
-    reservas_agrupadas = agrupar_por_habitacion(registros)
-    
-    print("\n2️⃣ Importando datos a la hoja de Ingresos...")
-    
-    # 4. Importar a Ingresos (Append)
-    
-    # Encontrar la primera fila vacía para empezar a escribir
-    # Buscar desde la fila 2 (después de encabezados) la primera fila completamente vacía
-    row_idx = 2
-    for row in range(2, ws_ingresos.max_row + 2):
-        # Verificar si la fila está vacía (columna A = HAB)
-        if ws_ingresos.cell(row, 1).value is None:
-            row_idx = row
-            break
-
-    # Columnas de la hoja Ingresos (basado en el CSV compartido)
-    # A=HAB(1), B=IN(2), C=OUT(3), D=PAX(4), E=ID(5), F=N.º(6), G=NOMBRE(7), H=EDAD(8), 
-    # I=VOUCHER(9), J=MAP(10), K=ESTADO(11), L=BENEFICIO(12), M=SEDE(13)
-    
-    for registro in registros:
-        # Escribir valores en la fila actual
-        ws_ingresos.cell(row_idx, 1, registro['HAB'])
-        ws_ingresos.cell(row_idx, 2, registro['IN'])
-        ws_ingresos.cell(row_idx, 3, registro['OUT'])
-        ws_ingresos.cell(row_idx, 4, registro['PAX'])
-        ws_ingresos.cell(row_idx, 5, registro['ID'])
-        ws_ingresos.cell(row_idx, 6, registro['N.º'])
-        ws_ingresos.cell(row_idx, 7, registro['NOMBRE'])
-        ws_ingresos.cell(row_idx, 8, registro['EDAD'])
-        ws_ingresos.cell(row_idx, 9, registro['VOUCHER'])
-        ws_ingresos.cell(row_idx, 10, registro['MAP'])
-        ws_ingresos.cell(row_idx, 11, registro['ESTADO'])
-        ws_ingresos.cell(row_idx, 12, registro['BENEFICIO'])
-        ws_ingresos.cell(row_idx, 13, registro['SEDE'])
-        # Si usas observaciones (Columna N)
-        # ws_ingresos.cell(row_idx, 14, registro['OBSERVACIONES'])
-        
-        row_idx += 1 # Avanzar a la siguiente fila
+    total_habitaciones = len(habitaciones_unicas)
+    print(f"   ✅ Se importaron {total_pax - repetidas} registros a Ingresos.")
+    if repetidas:
+        print(f"   🔁 {repetidas} reservas ya importadas antes (no se duplican)")
+    if regresos:
+        print(f"   ⭐ {regresos} pasajeros que regresan (marcados en OBSERVACIONES)")
+    print(f"📊 Cálculos Completados: Pax={total_pax}, Habitaciones={total_habitaciones}, Cenas(MP)={total_map}")
+    # --------------------------------------------------------------------------
 
-    print(f"   ✅ Se importaron {len(registros)} registros a Ingresos.")
-    
-    print("\n3️⃣ Distribuyendo pasajeros a las grillas de Pisos...")
+    print("\n2️⃣ Distribuyendo pasajeros a las grillas de Pisos...")
     actualizaciones_exitosas = 0
+    habitaciones_sin_cambios = 0
     
-    # 5. Distribución a Pisos (Sobreescritura dirigida)
+    # 4. Distribución a Pisos (Sobreescritura dirigida)
+    # Cada hoja es independiente: los lotes de escritura se calculan por piso y
+    # después se aplican en el libro. No se paraleliza: la planificación es Python
+    # puro (con hilos no avanza por el GIL) y tarda ~1 ms para todo el hotel, menos
+    # de lo que cuesta levantar un pool de procesos; las hojas de openpyxl tampoco
+    # se pueden pasar a otro proceso (no se serializan con pickle), así que la
+    # escritura en el libro queda siempre en este proceso
+    habitaciones_por_piso = defaultdict(list)
     for (sheet_name, room_number), pax_list in reservas_agrupadas.items():
         if sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            encontrado = False
-            
-            # Buscar el número de habitación en la columna B (índice 2)
-            for row_idx, row in enumerate(ws.iter_rows(min_col=2, max_col=2, values_only=True)):
-                if str(row[0]).strip() == str(room_number):
-                    encontrado = True
-                    current_row = row_idx + 1 # Convertir a índice de fila basado en 1
-
-                    # Iterar sobre los pasajeros de esa habitación y escribirlos en filas consecutivas
-                    for idx, data in enumerate(pax_list):
-                        
-                        # Columna 3 (C) es la primera columna de datos (IN)
-                        # Columna 12 (L) es la última columna de datos (ESTADO)
-                        
-                        # Limpiar las celdas de la fila actual antes de escribir
-                        for col_to_clear in range(3, 13):
-                             ws.cell(current_row, col_to_clear, value=None)
-                            
-                        # Mapeo de columnas de piso (C a L)
-                        ws.cell(current_row, 3, data['IN'])        # C = IN
-                        ws.cell(current_row, 4, data['OUT'])       # D = OUT
-                        ws.cell(current_row, 5, data['PAX'])       # E = PAX
-                        # !!! CORRECCIÓN CRÍTICA DE MAPEO DE DNI Y NÚMERO !!!
-                        ws.cell(current_row, 6, data['N.º'])        # F = DNI (Número de Documento)
-                        ws.cell(current_row, 7, data['ID'])         # G = NUMERO (Tipo de Documento)
-                        ws.cell(current_row, 8, data['NOMBRE'])    # H = NOMBRE
-                        ws.cell(current_row, 9, data['EDAD'])      # I = EDAD
-                        ws.cell(current_row, 10, data['VOUCHER'])  # J = VOUCHER
-                        ws.cell(current_row, 11, data['MAP'])      # K = COMIDA
-                        ws.cell(current_row, 12, data['ESTADO'])   # L = ESTADO
-
-                        actualizaciones_exitosas += 1
-                        current_row += 1  # Siguiente fila para el próximo pax
-                    
-                    break
-            
-            if not encontrado:
-                print(f"      ⚠️  HAB {room_number} NO encontrada en {sheet_name}")
+            habitaciones_por_piso[sheet_name].append((room_number, pax_list, sin_lugar[(sheet_name, room_number)]))
+
+    def planificar(sheet_name):
+        return planificar_piso(sheet_name, habitaciones_por_piso[sheet_name], indices_pisos[sheet_name],
+                               ocupantes_anteriores, delta)
+
+    with perfil.fase('Planificación de pisos'):
+        planes = {sheet_name: planificar(sheet_name) for sheet_name in habitaciones_por_piso}
+
+    for sheet_name, plan in planes.items():
+        if plan['escrituras']:
+            with perfil.fase(f'Escritura {sheet_name}'):
+                ws = servicio.hoja(sheet_name)
+                for fila, col, valor in plan['escrituras']:
+                    ws.cell(fila, col).value = valor
+        for aviso in plan['avisos']:
+            print(aviso)
+        actualizaciones_exitosas += plan['pax']
+        habitaciones_sin_cambios += plan['sin_cambios']
+        ocupantes_anteriores.update(plan['ocupantes'])
     
     # --------------------------------------------------------------------------
     # 📝 ESCRIBIR RESUMEN EN PISO 1 (después de la última habitación)
     # --------------------------------------------------------------------------
-    print("\n4️⃣ Escribiendo resumen estadístico en PISO 1...")
+    print("\n3️⃣ Escribiendo resumen estadístico en PISO 1...")
     
-    ws_piso1 = wb['PISO 1']
+    ws_piso1 = servicio.hoja('PISO 1')
     
     # Colocar resumen en fila 278 (5 filas después de "BEBIDAS" que está en fila 273)
     fila_resumen = 278
@@ -295,45 +530,75 @@ def procesar_reservas(csv_file):
     print(f"      • Total Media Pensión: {total_map}")
     # --------------------------------------------------------------------------
     
-    # 6. Guardar
+    # 5. Guardar
     print(f"\n📊 Resumen:")
-    print(f"   • Registros en Ingresos: {len(registros)}")
+    print(f"   • Registros en Ingresos: {total_pax}")
     print(f"   • Pax distribuidos en pisos: {actualizaciones_exitosas}")
+    if delta:
+        print(f"   • Habitaciones sin cambios (no se reescriben): {habitaciones_sin_cambios}")
     
+    perfil.datos.update({
+        'archivos': [resumen['archivo'] for resumen in resumen_archivos],
+        'registros': total_pax,
+        'importados': total_pax - repetidas,
+        'habitaciones': total_habitaciones,
+        'pax_en_pisos': actualizaciones_exitosas,
+        'regresos': regresos,
+    })
+
     print("\n💾 Guardando cambios...")
     
     try:
-        wb.save(EXCEL_FILE)
-        print(f"✅ Archivo guardado: {EXCEL_FILE}")
+        with perfil.fase('Guardado'):
+            servicio.guardar()
+            print(f"✅ Archivo guardado: {EXCEL_FILE}")
+            guardar_huellas({'huellas': sorted(huellas_importadas), 'habitaciones': ocupantes_anteriores})
         
         print("\n" + "="*70)
         print("✅ PROCESO COMPLETADO EXITOSAMENTE")
         print("="*70)
-        print(f"   ✓ Importación a Ingresos: {len(registros)} registros")
+        print(f"   ✓ Importación a Ingresos: {total_pax - repetidas} registros")
         print(f"   ✓ Distribución a pisos: {actualizaciones_exitosas} pax en grilla")
         print(f"   ✓ Archivo: {EXCEL_FILE}")
+        if len(resumen_archivos) > 1:
+            print(f"   ✓ CSV importados: {len(resumen_archivos)}")
+            for resumen in resumen_archivos:
+                print(f"      • {resumen['archivo']}: {resumen['registros'] - resumen['repetidas']} registros nuevos"
+                      f" de {resumen['registros']}")
         print("="*70)
+        perfil.imprimir()
         
         return True
     except PermissionError:
         print(f"❌ ERROR al guardar: Permiso denegado.")
         print(f"   Asegúrate de que el archivo '{EXCEL_FILE}' esté CERRADO y no en uso.")
+        servicio.descartar()
         return False
     except Exception as e:
         print(f"❌ ERROR al guardar: {e}")
+        servicio.descartar()
         return False
 
 def main():
-    if len(sys.argv) < 2:
-        print("❌ ERROR: Falta el archivo CSV")
-        print("\nUso:")
-        print("  python procesar_reservas.py archivo.csv")
-        print("\nEjemplo:")
-        print("  python procesar_reservas.py test-data-map.csv")
+    parser = argparse.ArgumentParser(
+        description='Importa CSV de reservas a la hoja Ingresos y a las grillas de pisos',
+        epilog='Ejemplos: python procesar_reservas.py test-data-map.csv | '
+               'python procesar_reservas.py "exports/*.csv" sede2.csv'
+    )
+    parser.add_argument('archivos', nargs='+', help='CSV exportados del PMS (acepta patrones como "exports/*.csv")')
+    parser.add_argument('--delta', action='store_true',
+                        help='Importar solo reservas nuevas y reescribir solo las habitaciones que cambiaron')
+    perfilado.agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    archivos = expandir_archivos(args.archivos)
+    if not archivos:
+        print("❌ ERROR: No hay archivos CSV para importar")
         sys.exit(1)
-        
-    csv_file = sys.argv[1]
-    procesar_reservas(csv_file)
+
+    perfil = perfilado.desde_argumentos('procesar_reservas', args)
+    exito = procesar_reservas(archivos, delta=args.delta, perfil=perfil)
+    perfil.terminar(exito)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
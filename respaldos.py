@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén de respaldos direccionado por contenido.
+Cada versión de un archivo se guarda una sola vez, comprimida y con el hash
+SHA-256 de su contenido como nombre (respaldos/objetos/<hash>.gz, o .zst si
+está instalado zstandard). El índice respaldos/indice.json registra qué
+archivo se respaldó, cuándo y con qué etiqueta. Respaldar un archivo que no
+cambió desde su último respaldo no escribe nada.
+
+Por defecto se conservan todas las versiones (historico.py las vuelve a leer
+con --respaldos). La retención es opcional: podar con --conservar N y/o
+--dias N descarta versiones viejas; los objetos que ya no figuran en el
+índice se borran siempre.
+
+Uso:
+    python respaldos.py listar [archivo]
+    python respaldos.py respaldar archivo [--etiqueta texto]
+    python respaldos.py restaurar <hash o prefijo> [--destino ruta]
+    python respaldos.py podar [--conservar N] [--dias N]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # Opcional: sin zstandard se comprime con gzip
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo queda el lock entre hilos del proceso
+    fcntl = None
+
+DIRECTORIO_RESPALDOS = 'respaldos'
+INDICE_RESPALDOS = os.path.join(DIRECTORIO_RESPALDOS, 'indice.json')
+BLOQUEO_RESPALDOS = os.path.join(DIRECTORIO_RESPALDOS, 'indice.lock')
+DIRECTORIO_OBJETOS = os.path.join(DIRECTORIO_RESPALDOS, 'objetos')
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+TAMANIO_BLOQUE = 1024 * 1024
+
+_lock = threading.Lock()
+
+@contextmanager
+def _bloqueo():
+    """Exclusión mutua sobre el índice entre hilos y entre procesos (flock)"""
+    os.makedirs(DIRECTORIO_OBJETOS, exist_ok=True)
+    with _lock:
+        archivo = open(BLOQUEO_RESPALDOS, 'a') if fcntl is not None else None
+        try:
+            if archivo is not None:
+                fcntl.flock(archivo, fcntl.LOCK_EX)
+            yield
+        finally:
+            if archivo is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+                archivo.close()
+
+def _leer_indice():
+    try:
+        with open(INDICE_RESPALDOS, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def _guardar_indice(entradas):
+    temporal = INDICE_RESPALDOS + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(entradas, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, INDICE_RESPALDOS)
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    digesto = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANIO_BLOQUE), b''):
+            digesto.update(bloque)
+    return digesto.hexdigest()
+
+def ruta_objeto(entrada):
+    """Ruta del objeto comprimido de una entrada del índice"""
+    extension = 'zst' if entrada['compresion'] == 'zstd' else 'gz'
+    return os.path.join(DIRECTORIO_OBJETOS, f"{entrada['hash']}.{extension}")
+
+def _objeto_existente(hash_contenido):
+    """Compresión del objeto ya guardado con ese hash, o None"""
+    for compresion in ('zstd', 'gzip'):
+        if os.path.exists(ruta_objeto({'hash': hash_contenido, 'compresion': compresion})):
+            return compresion
+    return None
+
+def _comprimir(ruta, destino, compresion):
+    temporal = destino + '.tmp'
+    with open(ruta, 'rb') as origen:
+        if compresion == 'zstd':
+            with open(temporal, 'wb') as salida:
+                zstandard.ZstdCompressor().copy_stream(origen, salida)
+        else:
+            with gzip.open(temporal, 'wb') as salida:
+                shutil.copyfileobj(origen, salida, TAMANIO_BLOQUE)
+    os.replace(temporal, destino)
+
+def respaldar(ruta, etiqueta='', nombre=None):
+    """
+    Respalda el archivo en el almacén. nombre es el archivo al que
+    corresponde la versión (por defecto el nombre de ruta) y es el destino
+    por defecto al restaurar. Retorna la entrada del índice con 'nuevo'
+    en False si el contenido no cambió desde el último respaldo de ese archivo.
+    """
+    nombre = nombre or os.path.basename(ruta)
+    hash_contenido = hash_archivo(ruta)
+
+    with _bloqueo():
+        entradas = _leer_indice()
+        anteriores = [entrada for entrada in entradas if entrada['nombre'] == nombre]
+        if anteriores and anteriores[-1]['hash'] == hash_contenido:
+            return dict(anteriores[-1], nuevo=False)
+
+        compresion = _objeto_existente(hash_contenido)
+        if compresion is None:
+            compresion = 'zstd' if zstandard is not None else 'gzip'
+            _comprimir(ruta, ruta_objeto({'hash': hash_contenido, 'compresion': compresion}), compresion)
+
+        entrada = {
+            'fecha': datetime.now().strftime(FORMATO_FECHA),
+            'nombre': nombre,
+            'etiqueta': etiqueta,
+            'hash': hash_contenido,
+            'tamanio': os.path.getsize(ruta),
+            'compresion': compresion
+        }
+        entradas.append(entrada)
+        _guardar_indice(entradas)
+        return dict(entrada, nuevo=True)
+
+def listar(nombre=None):
+    """Entradas del índice (de un archivo o de todos), de la más vieja a la más nueva"""
+    with _bloqueo():
+        entradas = _leer_indice()
+    return [entrada for entrada in entradas if nombre is None or entrada['nombre'] == nombre]
+
+def buscar(hash_o_prefijo):
+    """Última entrada cuyo hash empieza con hash_o_prefijo (ValueError si no hay o es ambiguo)"""
+    coincidencias = [entrada for entrada in listar() if entrada['hash'].startswith(hash_o_prefijo)]
+    if not coincidencias:
+        raise ValueError(f"No hay respaldos con hash '{hash_o_prefijo}'")
+    if len({entrada['hash'] for entrada in coincidencias}) > 1:
+        raise ValueError(f"El prefijo '{hash_o_prefijo}' corresponde a más de un respaldo")
+    return coincidencias[-1]
+
+def restaurar(hash_o_prefijo, destino=None):
+    """
+    Descomprime la versión indicada en destino (por defecto el archivo
+    original), reemplazándolo de forma atómica. Retorna la ruta restaurada.
+    """
+    entrada = buscar(hash_o_prefijo)
+    destino = destino or entrada['nombre']
+    temporal = destino + '.restaurando'
+
+    with open(temporal, 'wb') as salida:
+        if entrada['compresion'] == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("El respaldo está comprimido con zstd: instalar zstandard para restaurarlo")
+            with open(ruta_objeto(entrada), 'rb') as origen:
+                zstandard.ZstdDecompressor().copy_stream(origen, salida)
+        else:
+            with gzip.open(ruta_objeto(entrada), 'rb') as origen:
+                shutil.copyfileobj(origen, salida, TAMANIO_BLOQUE)
+
+    if hash_archivo(temporal) != entrada['hash']:
+        os.remove(temporal)
+        raise RuntimeError(f"El respaldo {entrada['hash'][:12]} está dañado (el hash no coincide)")
+    os.replace(temporal, destino)
+    return destino
+
+def _podar(entradas, conservar=None, dias=None):
+    """Aplica la retención sobre el índice ya leído (llamar con el bloqueo tomado)"""
+    limite = datetime.now() - timedelta(days=dias) if dias is not None else None
+    vigentes = []
+    por_nombre = {}
+    for entrada in reversed(entradas):
+        cantidad = por_nombre.get(entrada['nombre'], 0)
+        vencida = limite is not None and datetime.strptime(entrada['fecha'], FORMATO_FECHA) < limite
+        # La versión más reciente de cada archivo siempre se conserva
+        if cantidad == 0 or ((conservar is None or cantidad < conservar) and not vencida):
+            vigentes.append(entrada)
+            por_nombre[entrada['nombre']] = cantidad + 1
+    vigentes.reverse()
+
+    if len(vigentes) != len(entradas):
+        _guardar_indice(vigentes)
+
+    referenciados = {os.path.basename(ruta_objeto(entrada)) for entrada in vigentes}
+    borrados = 0
+    for objeto in os.listdir(DIRECTORIO_OBJETOS):
+        if objeto not in referenciados and not objeto.endswith('.tmp'):
+            os.remove(os.path.join(DIRECTORIO_OBJETOS, objeto))
+            borrados += 1
+    return len(entradas) - len(vigentes), borrados
+
+def podar(conservar=None, dias=None):
+    """
+    Conserva las últimas `conservar` versiones de cada archivo (todas si es
+    None) y, si se indica, solo las de los últimos `dias` días; borra los
+    objetos sin uso. Retorna (entradas descartadas, objetos borrados).
+    """
+    with _bloqueo():
+        return _podar(_leer_indice(), conservar, dias)
+
+def main():
+    parser = argparse.ArgumentParser(description='Almacén de respaldos comprimidos y sin duplicados')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_listar = subcomandos.add_parser('listar', help='Listar respaldos')
+    p_listar.add_argument('archivo', nargs='?', help='Solo los respaldos de este archivo')
+
+    p_respaldar = subcomandos.add_parser('respaldar', help='Respaldar un archivo')
+    p_respaldar.add_argument('archivo')
+    p_respaldar.add_argument('--etiqueta', default='manual')
+
+    p_restaurar = subcomandos.add_parser('restaurar', help='Restaurar una versión')
+    p_restaurar.add_argument('hash', help='Hash del respaldo (alcanza con los primeros caracteres)')
+    p_restaurar.add_argument('--destino', help='Ruta donde restaurar (por defecto el archivo original)')
+
+    p_podar = subcomandos.add_parser('podar', help='Aplicar la política de retención')
+    p_podar.add_argument('--conservar', type=int,
+                         help='Versiones a conservar por archivo (default: todas)')
+    p_podar.add_argument('--dias', type=int, help='Descartar versiones más viejas que estos días')
+
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'listar':
+            entradas = listar(args.archivo)
+            if not entradas:
+                print("📭 No hay respaldos.")
+            for entrada in entradas:
+                print(f"   {entrada['hash'][:12]}  {entrada['fecha']}  {entrada['nombre']}"
+                      f"  ({entrada['etiqueta'] or '-'}, {entrada['tamanio']:,} bytes, {entrada['compresion']})")
+        elif args.comando == 'respaldar':
+            entrada = respaldar(args.archivo, args.etiqueta)
+            estado = "creado" if entrada['nuevo'] else "sin cambios desde el último"
+            print(f"✅ Respaldo {estado}: {entrada['hash'][:12]} ({entrada['nombre']})")
+        elif args.comando == 'restaurar':
+            destino = restaurar(args.hash, args.destino)
+            print(f"✅ Restaurado en: {destino}")
+        elif args.comando == 'podar':
+            descartadas, borrados = podar(args.conservar, args.dias)
+            print(f"✅ Retención aplicada: {descartadas} versión(es) descartada(s), {borrados} objeto(s) borrado(s)")
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 #!/bin/bash
 # Script automatizado para iniciar el sistema de recepción del hotel
 # Compatible con Ubuntu nativo
+#
+# Uso:
+#   ./run_hotel.sh              # servidor de desarrollo de Flask (un proceso)
+#   ./run_hotel.sh produccion   # gunicorn con varios workers (RECEPCION_WORKERS, default 3)
+#   ./run_hotel.sh asgi         # uvicorn (ASGI) con varios workers
 
 # Obtener la ruta absoluta del proyecto
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" >/dev/null 2>&1 && pwd )"
 cd "$DIR"
 
+MODO="${1:-desarrollo}"
+WORKERS="${RECEPCION_WORKERS:-3}"
+case "$MODO" in
+    desarrollo|produccion|asgi) ;;
+    *)
+        echo "❌ Modo desconocido: $MODO (use desarrollo, produccion o asgi)"
+        exit 1
+        ;;
+esac
+
 echo "🏨 Sistema de Gestión Hotelera - Recepción 2026"
 echo "================================================"
 echo ""
@@ -45,7 +60,7 @@ echo "🌐 Abriendo navegador en 3 segundos..."
 (sleep 3 && xdg-open http://127.0.0.1:5000 2>/dev/null) &
 
 # 5. Ejecutar la aplicación Flask
-echo "🚀 Iniciando servidor Flask..."
+echo "🚀 Iniciando servidor Flask (modo $MODO)..."
 echo "================================================"
 echo ""
 echo "✅ Servidor iniciado correctamente"
@@ -57,4 +72,13 @@ echo ""
 echo "================================================"
 echo ""
 
-python3 app.py
+# Sin --preload: cada worker importa la app por su cuenta (el escritor por
+# lotes de consumos es un hilo y no sobrevive al fork)
+if [ "$MODO" = "produccion" ]; then
+    exec gunicorn app:app --workers "$WORKERS" --worker-class gthread --threads 4 \
+        --bind 0.0.0.0:5000 --timeout 120
+elif [ "$MODO" = "asgi" ]; then
+    exec uvicorn asgi:aplicacion --workers "$WORKERS" --host 0.0.0.0 --port 5000
+else
+    python3 app.py
+fi
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Libro Grilla de Pax de una operación de los scripts (importación o limpieza):
+lo carga una vez desde el disco y lo guarda con escritura atómica (archivo
+temporal + rename), así un corte a mitad del guardado nunca deja la grilla
+a medio escribir.
+
+Uso:
+    servicio = ServicioGrilla(EXCEL_FILE)
+    ws = servicio.hoja('PISO 1')
+    servicio.guardar()
+"""
+
+import os
+import stat
+import tempfile
+
+import openpyxl
+
+class ServicioGrilla:
+    """Libro XLSX de una operación, con guardado atómico"""
+
+    def __init__(self, ruta):
+        self.ruta = os.path.abspath(ruta)
+        self._wb = None
+
+    def libro(self):
+        """Retorna el libro parseado (se lee del disco la primera vez)"""
+        if self._wb is None:
+            self._wb = openpyxl.load_workbook(self.ruta)
+        return self._wb
+
+    def hoja(self, nombre):
+        return self.libro()[nombre]
+
+    def guardar(self):
+        """
+        Guarda el libro escribiendo primero un archivo temporal en la misma
+        carpeta y reemplazando el original con os.replace.
+        """
+        directorio = os.path.dirname(self.ruta)
+        descriptor, temporal = tempfile.mkstemp(prefix='.grilla_', suffix='.xlsx', dir=directorio)
+        os.close(descriptor)
+        try:
+            # mkstemp crea el archivo con permisos 0600: se conservan los del original
+            if os.path.exists(self.ruta):
+                os.chmod(temporal, stat.S_IMODE(os.stat(self.ruta).st_mode))
+            self.libro().save(temporal)
+            os.replace(temporal, self.ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def descartar(self):
+        """Olvida el libro en memoria (y sus cambios sin guardar)"""
+        self._wb = None